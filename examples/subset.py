@@ -1,10 +1,12 @@
 #!/usr/bin/env python
 
 '''
-usage:   subset.py my.pdf page[range] [page[range]] ...
+usage:   subset.py [-p] my.pdf page[range] [page[range]] ...
          eg. subset.py 1-3 5 7-9
 
-Creates subset.my.pdf
+Creates subset.my.pdf.  If -p is selected, each page only gets
+the resources (fonts, images, etc.) that its content uses, rather
+than every resource it shares with the other pages of my.pdf.
 
 '''
 
@@ -13,14 +15,18 @@ import os
 
 from pdfrw import PdfReader, PdfWriter
 
-inpfn = sys.argv[1]
-ranges = sys.argv[2:]
+argv = sys.argv[1:]
+prune = '-p' in argv
+if prune:
+    del argv[argv.index('-p')]
+inpfn = argv[0]
+ranges = argv[1:]
 assert ranges, "Expected at least one range"
 
 ranges = ([int(y) for y in x.split('-')] for x in ranges)
 outfn = 'subset.%s' % os.path.basename(inpfn)
 pages = PdfReader(inpfn).pages
-outdata = PdfWriter(outfn)
+outdata = PdfWriter(outfn, prune_resources=prune)
 
 for onerange in ranges:
     onerange = (onerange + onerange[-1:])[:2]
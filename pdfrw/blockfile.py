@@ -0,0 +1,158 @@
+# A part of pdfrw (https://github.com/pmaupin/pdfrw)
+# Copyright (C) 2006-2015 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Support for PdfReader(random_access=True).
+
+BlockFile presents a seekable binary file as a read-only,
+bytes-like object that can be wrapped in a BinaryData and
+parsed in place.  The file is only read when (and where) the
+parser looks at it, in fixed-size blocks.  The most recently
+used blocks are cached.
+
+The tokenizer cannot run regular expressions over a BlockFile
+directly, so it asks for a window of the file at a time.
+'''
+
+import os
+import collections
+
+
+class BlockFile(object):
+
+    # Size of each block read from the file
+    blocksize = 64 * 1024
+
+    # Number of blocks to keep in the cache
+    maxblocks = 64
+
+    # Minimum amount of data past the current position
+    # that the tokenizer wants in its window
+    margin = 4096
+
+    def __init__(self, f):
+        # The data starts wherever the file is positioned
+        self.f = f
+        self.start = f.tell()
+        f.seek(0, 2)
+        self.size = f.tell() - self.start
+        try:
+            fileno = f.fileno()
+            self.pread = os.pread
+        except (AttributeError, EnvironmentError, ValueError):
+            fileno = None
+            self.pread = None
+        self.fileno = fileno
+        self.blocks = collections.OrderedDict()
+        self.current_window = 0, b''
+        # Total number of bytes read from the file
+        self.bytes_read = 0
+
+    def __len__(self):
+        return self.size
+
+    def readat(self, pos, size):
+        ''' Read size bytes (fewer at the end of the file)
+            starting at position pos in the data.
+        '''
+        pread = self.pread
+        f = self.f
+        pos += self.start
+        parts = []
+        got = 0
+        # Reads can come up short, e.g. from a network file system
+        while got < size:
+            if pread is not None:
+                part = pread(self.fileno, size - got, pos + got)
+            else:
+                f.seek(pos + got)
+                part = f.read(size - got)
+            if not part:
+                break
+            parts.append(part)
+            got += len(part)
+        result = b''.join(parts)
+        self.bytes_read += len(result)
+        return result
+
+    def close(self):
+        self.blocks.clear()
+        self.current_window = 0, b''
+        self.f.close()
+
+    def block(self, num):
+        blocks = self.blocks
+        data = blocks.pop(num, None)
+        if data is None:
+            data = self.readat(num * self.blocksize, self.blocksize)
+            if len(blocks) >= self.maxblocks:
+                blocks.popitem(last=False)
+        blocks[num] = data
+        return data
+
+    def __getitem__(self, index, isinstance=isinstance, slice=slice):
+        if not isinstance(index, slice):
+            if index < 0:
+                index += self.size
+            if not 0 <= index < self.size:
+                raise IndexError('BlockFile index out of range')
+            return self[index:index + 1][0]
+        start, stop, step = index.indices(self.size)
+        if step != 1:
+            return self[start:stop][::step]
+        if stop <= start:
+            return b''
+        blocksize = self.blocksize
+        if stop - start > blocksize * 4:
+            # Big reads (e.g. streams) bypass the cache
+            return self.readat(start, stop - start)
+        first = start // blocksize
+        last = (stop - 1) // blocksize
+        offset = first * blocksize
+        if first == last:
+            return self.block(first)[start - offset:stop - offset]
+        data = b''.join(self.block(num) for num in range(first, last + 1))
+        return data[start - offset:stop - offset]
+
+    def find(self, sub, start=0, end=None):
+        if end is None or end > self.size:
+            end = self.size
+        chunk = self.blocksize
+        extra = len(sub) - 1
+        pos = start
+        while pos < end:
+            found = self[pos:min(end, pos + chunk + extra)].find(sub)
+            if found >= 0:
+                return pos + found
+            pos += chunk
+        return -1
+
+    def rfind(self, sub, start=0, end=None):
+        if end is None or end > self.size:
+            end = self.size
+        chunk = self.blocksize
+        extra = len(sub) - 1
+        stop = end
+        while stop > start:
+            pos = max(start, stop - chunk)
+            found = self[pos:min(end, stop + extra)].rfind(sub)
+            if found >= 0:
+                return pos + found
+            stop = pos
+        return -1
+
+    def window(self, pos, size=0):
+        ''' Return (base, data), where data is a copy of the file
+            starting at base (at or before pos), and covering at
+            least size bytes past pos, or up to the end of the file.
+        '''
+        base, data = self.current_window
+        end = base + len(data)
+        if base <= pos and (pos + (size or self.margin) <= end or
+                            end == self.size):
+            return base, data
+        base = pos - pos % self.blocksize
+        data = self[base:pos + max(size, self.blocksize)]
+        self.current_window = base, data
+        return base, data
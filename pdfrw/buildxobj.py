@@ -31,7 +31,7 @@ Reference for content:   Adobe PDF reference, sixth edition, version 1.7
 from .objects import PdfDict, PdfArray, PdfName
 from .pdfreader import PdfReader
 from .errors import log, PdfNotImplementedError
-from .py23_diffs import iteritems
+from .py23_diffs import iteritems, convert_load
 from .uncompress import uncompress
 from .compress import compress
 
@@ -208,7 +208,7 @@ def _build_cache(contents, allow_compressed):
     private.xobj_copy = xobj_copy
 
     if len(array) > 1:
-        newstream = '\n'.join(x.stream for x in array)
+        newstream = '\n'.join(convert_load(x.stream) for x in array)
         newlength = sum(int(x.Length) for x in array) + len(array) - 1
         assert newlength == len(newstream)
         xobj_copy.stream = newstream
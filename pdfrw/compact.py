@@ -0,0 +1,318 @@
+# A part of pdfrw (https://github.com/pmaupin/pdfrw)
+# Copyright (C) 2006-2015 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Support for PdfWriter(compact=True) and PdfWriter(prune_resources=True).
+
+find_unneeded() looks through everything that can be reached
+from the document catalog and the document information dictionary,
+and finds things that do not need to be written out:
+
+    - page thumbnail images (/Thumb), which viewers can make
+      for themselves
+
+    - entries in /Resources dictionaries that are not named in
+      any of the content streams that use the dictionary
+
+Nothing is changed.  Instead, it returns copies of the objects
+without those things, for the writer to use in their place.
+
+A /Resources dictionary is only pruned if all of its users are
+known: it must only be reached as the /Resources of pages, form
+XObjects, tiling patterns and Type 3 fonts, all of whose content
+streams can be read.  (So dictionaries that are inherited through
+the page tree are left alone.)  Any name that appears in a content
+stream counts as being used.
+
+page_resources() does the same for a single page that is being
+copied, but looks at the operators in the page's content stream to
+find which resources it uses, so that a /Resources dictionary that
+is shared by every page of a document can be cut down to what each
+page needs.
+'''
+
+import re
+
+from .objects import PdfDict, PdfArray, PdfName
+from .tokens import PdfTokens
+from .errors import PdfParseError
+from .uncompress import uncompress
+from .py23_diffs import convert_load
+
+# The kinds of resources that are referred to by name
+named_resources = set([PdfName.ExtGState, PdfName.ColorSpace,
+                       PdfName.Pattern, PdfName.Shading, PdfName.XObject,
+                       PdfName.Font, PdfName.Properties])
+
+# The kind of resource named by the last operand of each
+# content stream operator that uses one.
+operator_resources = {
+    'Do': PdfName.XObject,
+    'gs': PdfName.ExtGState,
+    'cs': PdfName.ColorSpace,
+    'CS': PdfName.ColorSpace,
+    'scn': PdfName.Pattern,
+    'SCN': PdfName.Pattern,
+    'sh': PdfName.Shading,
+    'BDC': PdfName.Properties,
+    'DP': PdfName.Properties,
+}
+
+# The end of the data of an inline image
+end_image = re.compile(r'\sEI(?=[\s/\[<(%]|$)')
+
+
+def content_streams(obj):
+    ''' If obj has content streams that use its /Resources, return
+        a list of them.  Otherwise, return None.
+    '''
+    if not isinstance(obj, PdfDict):
+        return None
+    if obj.Type == PdfName.Page:
+        contents = obj.Contents
+        if contents is None:
+            return []
+        if isinstance(contents, PdfArray):
+            return list(contents)
+        return [contents]
+    if obj.Type == PdfName.Font:
+        if obj.Subtype == PdfName.Type3:
+            return list((obj.CharProcs or {}).values())
+        return None
+    subtype = obj.Subtype
+    if (subtype == PdfName.Form or obj.PatternType == 1 or
+            (subtype is None and obj.BBox is not None)):
+        # Form XObjects (appearance streams often have no /Subtype)
+        # and tiling patterns
+        return [obj]
+    return None
+
+
+def stream_data(obj):
+    ''' Return the decompressed data from a stream, or
+        None if it can't be decompressed.
+    '''
+    data = getattr(obj, 'stream', None)
+    if data is None or obj.Filter is None:
+        return data
+    tmp = PdfDict(Filter=obj.Filter, DecodeParms=obj.DecodeParms or obj.DP)
+    tmp.indirect = obj.indirect
+    tmp._stream = data
+    if uncompress([tmp]):
+        return tmp.stream
+
+
+def content_names(streams):
+    ''' Return the set of names used in the content streams,
+        or None if one of them can't be read.
+    '''
+    names = set()
+    for stream in streams:
+        data = stream_data(stream)
+        if data is None:
+            return None
+        try:
+            names.update(tok for tok in
+                         PdfTokens(convert_load(data), verbose=False)
+                         if tok.startswith('/'))
+        except PdfParseError:
+            return None
+    return names
+
+
+def used_resources(streams, isinstance=isinstance, len=len):
+    ''' Return a dict mapping each kind of resource to the set of
+        names of that kind that the content streams use, or None
+        if one of them can't be read.
+    '''
+    used = dict((key, set()) for key in named_resources)
+    for stream in streams:
+        data = stream_data(stream)
+        if data is None:
+            return None
+        data = convert_load(data)
+        tokens = PdfTokens(data, verbose=False)
+        operands = []
+        try:
+            for tok in tokens:
+                firstch = tok[:1]
+                if not (firstch.isalpha() or firstch in '\'"'):
+                    operands.append(tok)
+                    continue
+                if tok in ('true', 'false', 'null'):
+                    operands.append(tok)
+                    continue
+                if operands:
+                    kind = operator_resources.get(tok)
+                    if kind is not None:
+                        used[kind].add(operands[-1])
+                    elif tok == 'Tf' and len(operands) > 1:
+                        used[PdfName.Font].add(operands[-2])
+                    elif tok == 'ID':
+                        # An inline image can name a color space
+                        # (as /CS or /ColorSpace)
+                        for key, value in zip(operands, operands[1:]):
+                            if key in ('/CS', '/ColorSpace'):
+                                used[PdfName.ColorSpace].add(value)
+                if tok == 'ID':
+                    # Skip over the image data
+                    match = end_image.search(data, tokens.floc)
+                    if match is None:
+                        return None
+                    tokens.floc = match.start()
+                operands = []
+        except PdfParseError:
+            return None
+    return used
+
+
+def page_resources(page, resources, isinstance=isinstance):
+    ''' Return the /Resources dictionary to write for a page that
+        is being copied, with only the resources that the page uses.
+        Forms, patterns and Type 3 fonts that have no /Resources of
+        their own use the page's, so they are looked at as well.
+        If anything can't be read, resources is returned unchanged.
+    '''
+    if not isinstance(resources, PdfDict):
+        return resources
+    used = dict((key, set()) for key in named_resources)
+    todo = [page]
+    seen = set()
+    while todo:
+        holder = todo.pop()
+        if id(holder) in seen:
+            continue
+        seen.add(id(holder))
+        streams = content_streams(holder)
+        if streams is None:
+            continue
+        found = used_resources(streams)
+        if found is None:
+            return resources
+        for key, names in found.items():
+            names -= used[key]
+            used[key] |= names
+            category = resources[key]
+            if not isinstance(category, PdfDict):
+                continue
+            for name in names:
+                obj = category[name]
+                if isinstance(obj, PdfDict) and obj.Resources is None:
+                    todo.append(obj)
+    pruned = prune_resources(resources, used)
+    return resources if pruned is None else pruned
+
+
+def prune_resources(resources, used):
+    ''' Return a copy of a /Resources dictionary, with only the
+        resources of each kind named in used, or None if nothing
+        would be left out.
+    '''
+    result = PdfDict()
+    changed = False
+    for key, value in resources.iteritems():
+        if key in named_resources and isinstance(value, PdfDict):
+            names = used[key]
+            kept = PdfDict()
+            for name, item in value.iteritems():
+                if name in names:
+                    kept[name] = item
+            if len(kept) < len(value):
+                changed = True
+                value = kept or None
+        result[key] = value
+    if changed:
+        result.indirect = resources.indirect
+        return result
+
+
+def find_unneeded(roots, resolve, is_indirect, isinstance=isinstance,
+                  id=id, dict=dict, list=list, tuple=tuple, vars=vars):
+    ''' Return a dict mapping the ids of indirect objects that
+        contain things that are not needed to copies without them.
+        resolve(obj) returns the object that will be written out
+        in place of obj, and is_indirect(obj) returns true if the
+        object will be written out as an indirect object.
+    '''
+    users = {}
+    allresources = {}
+    elsewhere = set()
+    pages = []
+    loose = False
+    stack = [resolve(x) for x in roots if x is not None]
+    seen = set()
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, dict):
+            holder = content_streams(obj) is not None
+            if holder and obj.Resources is None:
+                if obj.Type != PdfName.Page:
+                    # Might use the resources of whatever uses it
+                    loose = True
+            if obj.Type == PdfName.Page:
+                pages.append(obj)
+            items = obj.iteritems()
+        elif isinstance(obj, (list, tuple)):
+            holder = False
+            items = ((None, x) for x in obj)
+        else:
+            continue
+        for key, value in items:
+            value = resolve(value)
+            if isinstance(value, dict):
+                if holder and key == PdfName.Resources:
+                    users.setdefault(id(value), []).append(obj)
+                    allresources[id(value)] = value
+                else:
+                    elsewhere.add(id(value))
+            stack.append(value)
+
+    copies = {}
+
+    def copy(obj):
+        objid = id(obj)
+        result = copies.get(objid)
+        if result is None:
+            # Keep streams that have not been changed as they were read
+            rawstream = vars(obj).get('_rawstream')
+            if rawstream is not None:
+                obj = rawstream.original()
+            result = copies[objid] = PdfDict(obj)
+            result.indirect = True
+        return result
+
+    for page in pages:
+        if page.Thumb is not None and is_indirect(page):
+            copy(page).Thumb = None
+
+    if loose:
+        return copies
+
+    for resid, holders in users.items():
+        if resid in elsewhere:
+            continue
+        if not is_indirect(allresources[resid]):
+            if not all(is_indirect(x) for x in holders):
+                continue
+        names = set()
+        for holder in holders:
+            used = content_names(content_streams(holder))
+            if used is None:
+                break
+            names.update(used)
+        else:
+            resources = allresources[resid]
+            pruned = prune_resources(resources, dict(
+                (key, names) for key in named_resources))
+            if pruned is None:
+                continue
+            if is_indirect(resources):
+                copies[resid] = pruned
+            else:
+                for holder in holders:
+                    copy(holder).Resources = pruned
+    return copies
@@ -6,6 +6,11 @@
 Currently, this sad little file only knows how to compress
 using the flate (zlib) algorithm.  Maybe more later, but it's
 not a priority for me...
+
+zlib releases the GIL while it works, so with workers > 1,
+the streams are compressed concurrently in a thread pool.
+The results are applied in order, so the output is the
+same as when compressing serially.
 '''
 
 from .objects import PdfName
@@ -13,15 +18,48 @@ from .uncompress import streamobjects
 from .py23_diffs import zlib, convert_load, convert_store
 
 
-def compress(mylist):
+def compress(mylist, workers=1):
     flate = PdfName.FlateDecode
+    if workers > 1:
+        mylist = [obj for obj in streamobjects(mylist) if obj.Filter is None]
+        if len(mylist) > 1:
+            return compress_parallel(mylist, workers)
     for obj in streamobjects(mylist):
         ftype = obj.Filter
         if ftype is not None:
             continue
         oldstr = obj.stream
-        newstr = convert_load(zlib.compress(convert_store(oldstr)))
-        if len(newstr) < len(oldstr) + 30:
-            obj.stream = newstr
-            obj.Filter = flate
-            obj.DecodeParms = None
+        newstr = zlib.compress(convert_store(oldstr))
+        setstream(obj, oldstr, newstr, flate)
+
+
+def compress_parallel(mylist, workers):
+    # Imported here, because it is slow to import
+    from multiprocessing.pool import ThreadPool
+
+    flate = PdfName.FlateDecode
+    pool = ThreadPool(min(workers, len(mylist)))
+    try:
+        results = pool.imap(zlib.compress,
+                            (convert_store(obj.stream) for obj in mylist))
+        for obj, newstr in zip(mylist, results):
+            setstream(obj, obj.stream, newstr, flate)
+    finally:
+        pool.terminate()
+
+
+def setstream(obj, oldstr, newstr, flate, isinstance=isinstance,
+              bytes=bytes, len=len, vars=vars):
+    ''' Replace the stream with its compressed version, unless
+        that doesn't save any space.
+    '''
+    if not isinstance(oldstr, bytes):
+        newstr = convert_load(newstr)
+    if len(newstr) < len(oldstr) + 30:
+        # Compression alone doesn't count as a change
+        onchange = vars(obj).pop('_onchange', None)
+        obj.stream = newstr
+        obj.Filter = flate
+        obj.DecodeParms = None
+        if onchange is not None:
+            obj._onchange = onchange
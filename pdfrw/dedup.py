@@ -0,0 +1,269 @@
+# A part of pdfrw (https://github.com/pmaupin/pdfrw)
+# Copyright (C) 2006-2015 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Support for PdfWriter(dedup=True) and PdfWriter(dedup_direct=True).
+
+find_duplicates() finds indirect objects that would be written out
+exactly the same as another one, and find_shared_direct() finds
+direct dictionaries and arrays that are written out often enough
+that sharing one indirect copy of them makes the file smaller.
+
+Nothing is changed.  Both return a dict, keyed by the id of each
+object that should be replaced, of the object to write in its place.
+
+Both take the trailer, and these functions from FormatObjects:
+
+    resolve(obj) -- returns the object that will actually be
+                    written out in place of obj
+    is_indirect(obj) -- returns true if obj will be written
+                        out as an indirect object
+    user_fmt(obj) -- formats a simple object
+
+find_duplicates() also takes as_written(obj), which returns a
+PdfDict as it will be written out, with the stream it will have.
+'''
+
+from hashlib import sha256
+
+from .objects import PdfName, PdfArray, PdfDict
+from .py23_diffs import iteritems, convert_store
+
+
+def is_unique(obj, unique_types=(PdfName.Page, PdfName.Pages,
+                                 PdfName.Catalog, PdfName.Annot,
+                                 PdfName.StructElem)):
+    ''' Return true if the PdfDict obj must not be merged with
+        an identical one:  pages, page tree nodes and catalogs,
+        annotations (which may only appear on one page, ISO
+        32000 12.5.2), form fields (which have a place in the
+        field tree), and structure elements.
+    '''
+    return (obj.Type in unique_types or
+            obj.Subtype == PdfName.Widget or
+            PdfName.FT in obj or PdfName.Parent in obj)
+
+
+def find_duplicates(trailer, resolve, is_indirect, as_written, user_fmt):
+    ''' Return a dict mapping the id of each indirect object that
+        would be written out exactly the same as an earlier one
+        to that earlier one.
+
+        Each object is hashed after the objects it refers to, with
+        its references replaced by their hashes, so that objects
+        which only differ in which of two identical objects they
+        refer to are also found.  Objects in a reference loop are
+        referred to by identity.  Dictionaries that must stay
+        separate objects (see is_unique) are never merged.
+    '''
+    tokens = {}
+    first = {}
+    result = {}
+
+    def refs(obj, path=None):
+        ''' Yield the indirect objects that obj refers to.
+            path holds the direct objects that obj is inside.
+        '''
+        if path is not None and is_indirect(obj):
+            yield resolve(obj)
+        elif id(obj) in (path or ()):
+            return
+        elif isinstance(obj, (list, tuple, dict)):
+            path = (path or ()) + (id(obj),)
+            if isinstance(obj, dict):
+                obj = obj.values()
+            for value in obj:
+                for x in refs(value, path):
+                    yield x
+
+    def feed(update, obj, path=None):
+        ''' Feed what will be written for obj to the hash.
+        '''
+        if path is not None and is_indirect(obj):
+            update(tokens[id(resolve(obj))])
+        elif id(obj) in (path or ()):
+            # add() will make a copy of this
+            update(convert_store('loop %d' % path.index(id(obj))))
+        elif isinstance(obj, dict):
+            path = (path or ()) + (id(obj),)
+            if isinstance(obj, PdfDict):
+                obj = as_written(obj)
+                stream = obj.stream
+                pairs = sorted((getattr(x, 'encoded', None) or x, y)
+                               for (x, y) in obj.iteritems())
+            else:
+                stream = None
+                pairs = sorted(obj.items())
+            update(b'<<')
+            for key, value in pairs:
+                update(convert_store(key + ' '))
+                feed(update, value, path)
+            update(b'>>')
+            if stream is not None:
+                stream = convert_store(stream)
+                update(convert_store('stream %d ' % len(stream)))
+                update(stream)
+        elif isinstance(obj, (list, tuple)):
+            path = (path or ()) + (id(obj),)
+            update(b'[')
+            for value in obj:
+                feed(update, value, path)
+            update(b']')
+        elif hasattr(obj, 'indirect'):
+            update(convert_store(str(getattr(obj, 'encoded', None) or
+                                     obj) + ' '))
+        else:
+            update(convert_store(user_fmt(obj) + ' '))
+
+    # Visit the objects depth first, hashing each one
+    # once everything it refers to has been hashed.
+    stack = [(trailer, refs(trailer))]
+    visiting = set([id(trailer)])
+    while stack:
+        obj, kids = stack[-1]
+        for kid in kids:
+            kidid = id(kid)
+            if kidid in visiting:
+                # A loop, so refer to it by identity
+                tokens[kidid] = convert_store('id %d' % kidid)
+            elif kidid not in tokens:
+                visiting.add(kidid)
+                stack.append((kid, refs(kid)))
+                break
+        else:
+            stack.pop()
+            objid = id(obj)
+            visiting.discard(objid)
+            if objid in tokens or obj is trailer:
+                continue
+            h = sha256()
+            feed(h.update, obj)
+            tokens[objid] = token = h.digest()
+            if isinstance(obj, PdfDict) and is_unique(obj):
+                continue
+            original = first.setdefault(token, obj)
+            if original is not obj:
+                result[objid] = original
+    return result
+
+
+def find_shared_direct(trailer, resolve, is_indirect, user_fmt):
+    ''' Return a dict mapping the id of each direct dictionary or
+        array that should be written out as a shared indirect
+        object to that indirect object.
+
+        Direct objects are sorted into classes of identical
+        objects, each class being identified by the classes
+        of its contents (so each object is only looked at once),
+        and the number of times each class would be written out
+        is counted.  A class is shared if that saves space.
+        Things the trailer refers to directly, the contents
+        of the encryption dictionary, and dictionaries that
+        must stay separate objects (see is_unique) are left
+        alone.
+    '''
+    classes = {}
+    memo = {}
+    active = set()
+    sizes = []
+    counts = []
+    firsts = []
+
+    def classify(obj):
+        ''' Return the class number of a direct dict or array.
+        '''
+        objid = id(obj)
+        result = memo.get(objid)
+        if result is not None:
+            return result
+        if objid in active:
+            # A loop of direct objects (which add() will
+            # copy), so it can't match anything else
+            return 'loop', objid
+        if isinstance(obj, PdfDict) and is_unique(obj):
+            # (e.g. an annotation) so it can't be shared
+            return 'unique', objid
+        active.add(objid)
+        size = 2
+        if isinstance(obj, dict):
+            items = sorted(obj.items())
+            key = ['<<']
+        else:
+            items = enumerate(obj)
+            key = ['[']
+        for name, value in items:
+            if is_indirect(value):
+                value = 'R', id(resolve(value))
+                size += 9
+            elif isinstance(value, (list, tuple, dict)):
+                value = classify(value)
+                size += sizes[value] if isinstance(value, int) else 9
+            else:
+                if hasattr(value, 'indirect'):
+                    value = str(getattr(value, 'encoded', None) or
+                                value)
+                else:
+                    value = user_fmt(value)
+                size += len(value) + 1
+            if key[0] == '<<':
+                key.append(name)
+                size += len(name) + 1
+            key.append(value)
+        active.discard(objid)
+        key = tuple(key)
+        result = classes.get(key)
+        if result is None:
+            result = classes[key] = len(sizes)
+            sizes.append(size)
+            counts.append(0)
+            firsts.append(obj)
+        memo[objid] = result
+        return result
+
+    def count(obj):
+        ''' Count the direct objects inside obj, and
+            return the indirect objects it refers to.
+        '''
+        found = []
+        stack = [obj]
+        while stack:
+            obj = stack.pop()
+            if isinstance(obj, dict):
+                obj = obj.values()
+            for value in obj:
+                if is_indirect(value):
+                    found.append(resolve(value))
+                elif isinstance(value, (list, tuple, dict)):
+                    kind = classify(value)
+                    if isinstance(kind, int):
+                        counts[kind] += 1
+                        if counts[kind] > 1:
+                            # Only written once if shared
+                            continue
+                    stack.append(value)
+        return found
+
+    encrypt = trailer.Encrypt
+    stack = [resolve(x) for x in trailer.values() if is_indirect(x)]
+    seen = set()
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if obj is not encrypt and isinstance(obj, (list, tuple, dict)):
+            stack.extend(count(obj))
+
+    shared = {}
+    for kind, obj in enumerate(firsts):
+        number = counts[kind]
+        if (number - 1) * sizes[kind] > number * 9 + 40:
+            if isinstance(obj, dict):
+                obj = PdfDict(obj)
+            else:
+                obj = PdfArray(obj)
+            obj.indirect = True
+            shared[kind] = obj
+    return dict((objid, shared[kind]) for objid, kind in iteritems(memo)
+                if kind in shared)
@@ -8,6 +8,7 @@
 '''
 
 from .objects import PdfDict, PdfArray, PdfName
+from .py23_diffs import convert_load
 
 
 def find_objects(source, valid_types=(PdfName.XObject, None),
@@ -105,7 +106,7 @@ def trivial_xobjs(maxignore=300):
     def check(obj):
         if obj.Subtype == Image:
             return False
-        s = obj.stream
+        s = convert_load(obj.stream)
         if len(s) < maxignore:
             s = (x for x in s.split() if not x.startswith('/') and
                  x not in ignore)
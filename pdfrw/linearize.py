@@ -0,0 +1,295 @@
+# A part of pdfrw (https://github.com/pmaupin/pdfrw)
+# Copyright (C) 2006-2015 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Support for PdfWriter(linearize=True).
+
+FormatObjects formats every object once, recording the numbers of
+the objects each one refers to.  write_linearized() then works out
+which objects each page needs, renumbers the objects into linearized
+order (PDF Reference, Annex F), formats them again, and writes out
+the file, with its hint stream and both cross-reference sections.
+'''
+
+from struct import pack
+
+from .objects import PdfName, PdfDict, PdfObject
+from .errors import PdfOutputError
+from .py23_diffs import iteritems, zlib
+
+
+def pack_bits(fields):
+    ''' Pack a sequence of (value, nbits) fields, most significant
+        bit first, into bytes.  A None field pads out to the next
+        byte boundary.
+    '''
+    result = bytearray()
+    value = count = 0
+    for field in fields:
+        if field is None:
+            field = 0, -count % 8
+        x, nbits = field
+        value = (value << nbits) | x
+        count += nbits
+        while count >= 8:
+            count -= 8
+            result.append((value >> count) & 255)
+        value &= (1 << count) - 1
+    if count:
+        result.append((value << (8 - count)) & 255)
+    return bytes(result)
+
+
+def closure(references, objnum, stop):
+    ''' Return the numbers of objnum and all the objects it
+        refers to, directly or indirectly, without going
+        through the objects in stop.
+    '''
+    result = [objnum]
+    seen = set(result)
+    stack = [objnum]
+    while stack:
+        for objnum in references[stack.pop()]:
+            if objnum not in seen and objnum not in stop:
+                seen.add(objnum)
+                result.append(objnum)
+                stack.append(objnum)
+    return result
+
+
+def find_pages(root, objects, objnum_of):
+    ''' Return the numbers of the page objects, in order, and
+        of the nodes of the page tree under root.
+    '''
+    pagenums = []
+    treenums = set()
+    stack = [root]
+    while stack:
+        objnum = objnum_of(stack.pop())
+        if objnum is None or objnum in treenums:
+            continue
+        node = objects[objnum]
+        if node.Type == PdfName.Pages:
+            treenums.add(objnum)
+            stack.extend(reversed(node.Kids or ()))
+        elif node.Type == PdfName.Page and objnum not in pagenums:
+            pagenums.append(objnum)
+    return pagenums, treenums
+
+
+def write_linearized(trailer, header, objects, references, objnum_of,
+                     renumber_objects, format_obj, write_obj,
+                     object_size, f_write):
+    ''' Write the file out in linearized order:
+
+            header
+            linearization parameter dictionary
+            first-page cross-reference section and trailer
+            catalog (and encryption dictionary)
+            primary hint stream
+            first page, and everything it uses
+            remaining pages, each with the objects only it uses
+            objects shared by the remaining pages
+            other objects
+            main cross-reference section and trailer
+
+        The objects are renumbered so that the main
+        cross-reference section covers the objects after the
+        first page, and the first-page cross-reference section
+        covers the rest.  Every object in the hint tables is
+        its own shared object group, and content stream
+        positions are not given.
+
+        objects and references map the number of each object to
+        it, and to the numbers of the objects it refers to.  The
+        functions are FormatObjects' own; renumber_objects() is
+        given the new number for each object number, and is called
+        before the objects are formatted again with the new numbers.
+    '''
+    catalog = objnum_of(trailer.Root)
+    pagenums, treenums = find_pages(trailer.Root.Pages, objects, objnum_of)
+    if not pagenums:
+        raise PdfOutputError('Cannot linearize a PDF with no pages')
+    stop = treenums | set(pagenums)
+    stop.add(catalog)
+    part4 = [catalog]
+    encrypt = trailer.Encrypt
+    if encrypt is not None and objnum_of(encrypt) is not None:
+        part4.append(objnum_of(encrypt))
+        stop.add(part4[-1])
+
+    # Sort the objects into the first page, the objects used
+    # by just one later page, and those shared by later pages.
+    first = closure(references, pagenums[0], stop)
+    firstset = set(first)
+    used = [closure(references, objnum, stop) for objnum in pagenums[1:]]
+    users = {}
+    for objnums in used:
+        for objnum in objnums:
+            users[objnum] = users.get(objnum, 0) + 1
+    shared = sorted(x for x in users if users[x] > 1 and
+                    x not in firstset)
+    sharedset = set(shared)
+    pageobjs = [[x for x in objnums
+                 if x not in firstset and x not in sharedset]
+                for objnums in used]
+    placed = set(firstset)
+    placed.update(part4)
+    placed.update(x for objnums in used for x in objnums)
+    other = [x for x in range(1, len(objects) + 1) if x not in placed]
+
+    mainorder = [x for objnums in pageobjs for x in objnums]
+    mainorder += shared + other
+    nummain = len(mainorder)
+    renumber = dict((x, i + 1) for i, x in enumerate(mainorder))
+    lin_num = nummain + 1
+    objnum = lin_num + 1
+    for x in part4:
+        renumber[x] = objnum
+        objnum += 1
+    hint_num = objnum
+    objnum += 1
+    for x in first:
+        renumber[x] = objnum
+        objnum += 1
+    size = objnum
+
+    # Format everything again with the new numbers
+    renumber_objects(renumber)
+    formatted = {}
+    for objnum, obj in sorted(iteritems(objects)):
+        formatted[renumber[objnum]] = format_obj(obj)
+    part4 = [renumber[x] for x in part4]
+    first = [renumber[x] for x in first]
+
+    def first_trailer(prev):
+        newtrailer = PdfDict(trailer)
+        newtrailer.Size = PdfObject(size)
+        newtrailer.Prev = PdfObject('%10d' % prev)
+        return ('xref\n%s %s\n' % (lin_num, size - lin_num),
+                'trailer\n\n%s\nstartxref\n0\n%%%%EOF\n' %
+                format_obj(newtrailer))
+
+    lin_fmt = ('<</Linearized 1 /L %10d /H [%10d %10d] /O %s '
+               '/E %10d /N %s /T %10d>>')
+    xref_start, trailer_str = first_trailer(0)
+
+    # Lay the file out, as if there were no hint stream
+    position = len(header)
+    lin_offset = position
+    position += object_size(lin_num, lin_fmt % (
+        0, 0, 0, renumber[pagenums[0]], 0, len(pagenums), 0))
+    xref_offset = position
+    position += (len(xref_start) + 20 * (size - lin_num) +
+                 len(trailer_str))
+    offsets = {}
+    sizes = {}
+    for objnum in part4 + [None] + first + list(range(1, lin_num)):
+        if objnum is None:
+            hint_offset = position
+            continue
+        if objnum == 1:
+            end_first = position
+        offsets[objnum] = position
+        sizes[objnum] = object_size(objnum, formatted[objnum])
+        position += sizes[objnum]
+    if nummain == 0:
+        end_first = position
+    main_offset = position
+
+    # Page offset hint table
+    starts = [offsets[first[0]]]
+    nobjs = [len(first)]
+    for objnums in pageobjs:
+        starts.append(offsets[renumber[objnums[0]]])
+        nobjs.append(len(objnums))
+    after_pages = shared + other
+    ends = starts[2:] + [after_pages and
+                         offsets[renumber[after_pages[0]]] or
+                         main_offset]
+    lengths = [end_first - starts[0]]
+    lengths += [end - start for start, end in zip(starts[1:], ends)]
+    shared_ids = dict((x, i) for i, x in enumerate(first))
+    for x in shared:
+        shared_ids[renumber[x]] = len(shared_ids)
+    others_used = set(renumber[x] for objnums in used
+                      for x in objnums if x in firstset)
+    page_refs = [[shared_ids[x] for x in first if x in others_used]]
+    for objnums in used:
+        page_refs.append(sorted(shared_ids[renumber[x]]
+                                for x in objnums if x in firstset or
+                                x in sharedset))
+
+    def bits(values):
+        return max(values).bit_length()
+
+    least_objs = min(nobjs)
+    least_length = min(lengths)
+    obj_bits = bits([x - least_objs for x in nobjs])
+    length_bits = bits([x - least_length for x in lengths])
+    refs_bits = bits([len(x) for x in page_refs])
+    id_bits = bits([0] + [x for refs in page_refs for x in refs])
+    fields = [(x - least_objs, obj_bits) for x in nobjs] + [None]
+    fields += [(x - least_length, length_bits) for x in lengths]
+    fields.append(None)
+    fields += [(len(x), refs_bits) for x in page_refs] + [None]
+    fields += [(x, id_bits) for refs in page_refs for x in refs]
+    page_table = pack('>IIHIHIHIHHHHH', least_objs, starts[0],
+                      obj_bits, least_length, length_bits,
+                      0, 0, 0, 0, refs_bits, id_bits, 0, 1)
+    page_table += pack_bits(fields)
+
+    # Shared object hint table
+    groups = [sizes[x] for x in first]
+    groups += [sizes[renumber[x]] for x in shared]
+    least_group = min(groups)
+    group_bits = bits([x - least_group for x in groups])
+    first_shared = shared and renumber[shared[0]] or 0
+    shared_table = pack('>IIIIHIH', first_shared,
+                        offsets.get(first_shared, 0), len(first),
+                        len(groups), 0, least_group, group_bits)
+    fields = [(x - least_group, group_bits) for x in groups] + [None]
+    fields += [(0, 1) for x in groups]
+    shared_table += pack_bits(fields)
+
+    data = zlib.compress(page_table + shared_table)
+    hint = ('<</Filter /FlateDecode /Length %s /S %s>>' %
+            (len(data), len(page_table)), data)
+    hint_size = object_size(hint_num, hint)
+
+    # Now the real positions are known.
+    for objnum in offsets:
+        if offsets[objnum] >= hint_offset:
+            offsets[objnum] += hint_size
+    end_first += hint_size
+    main_offset += hint_size
+    main_start = 'xref\n0 %s\n' % lin_num
+    main_end = ('trailer\n\n<</Size %s>>\nstartxref\n%s\n%%%%EOF\n' %
+                (lin_num, xref_offset))
+    length = (main_offset + len(main_start) + 20 * lin_num +
+              len(main_end))
+
+    f_write(header)
+    write_obj(lin_num, lin_fmt % (length, hint_offset, hint_size,
+                                  first[0], end_first, len(pagenums),
+                                  main_offset + len(main_start) - 1))
+    xref_start, trailer_str = first_trailer(main_offset)
+    f_write(xref_start)
+    f_write('%010d 00000 n\r\n' % lin_offset)
+    for objnum in part4:
+        f_write('%010d 00000 n\r\n' % offsets[objnum])
+    f_write('%010d 00000 n\r\n' % hint_offset)
+    for objnum in first:
+        f_write('%010d 00000 n\r\n' % offsets[objnum])
+    f_write(trailer_str)
+    for objnum in part4:
+        write_obj(objnum, formatted[objnum])
+    write_obj(hint_num, hint)
+    for objnum in first + list(range(1, lin_num)):
+        write_obj(objnum, formatted[objnum])
+    f_write(main_start)
+    f_write('%010d 65535 f\r\n' % 0)
+    for objnum in range(1, lin_num):
+        f_write('%010d 00000 n\r\n' % offsets[objnum])
+    f_write(main_end)
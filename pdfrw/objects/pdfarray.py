@@ -13,6 +13,11 @@ def _resolved():
 class PdfArray(list):
     ''' A PdfArray maps the PDF file array object into a Python list.
         It has an indirect attribute which defaults to False.
+
+        If the _onchange attribute is set, it is called (with the
+        array as its argument) and then discarded the first time
+        the array is changed.  PdfReader uses this to keep track
+        of changed objects, as it does for PdfDict.
     '''
     indirect = False
 
@@ -28,20 +33,67 @@ class PdfArray(list):
                     value = value.real_value()
                     if value is None:
                         value = PdfNull
-                    self[index] = value
+                    list.__setitem__(self, index, value)
         self._resolve = resolved
 
+    def _changed(self, vars=vars):
+        ''' Call (and discard) _onchange, if it is set.
+        '''
+        onchange = vars(self).pop('_onchange', None)
+        if onchange is not None:
+            onchange(self)
+
     def __getitem__(self, index, listget=list.__getitem__):
         self._resolve()
         return listget(self, index)
 
+    def __setitem__(self, index, value, listset=list.__setitem__):
+        self._changed()
+        listset(self, index, value)
+
+    def __delitem__(self, index, listdel=list.__delitem__):
+        self._changed()
+        listdel(self, index)
+
+    def __iadd__(self, other):
+        self._changed()
+        return list.__iadd__(self, other)
+
+    def __imul__(self, other):
+        self._changed()
+        return list.__imul__(self, other)
+
     try:
         def __getslice__(self, i, j, listget=list.__getslice__):
             self._resolve()
             return listget(self, i, j)
+
+        def __setslice__(self, i, j, value, listset=list.__setslice__):
+            self._changed()
+            listset(self, i, j, value)
+
+        def __delslice__(self, i, j, listdel=list.__delslice__):
+            self._changed()
+            listdel(self, i, j)
     except AttributeError:
         pass
 
+    def append(self, item):
+        self._changed()
+        list.append(self, item)
+
+    def extend(self, items):
+        self._changed()
+        list.extend(self, items)
+
+    def insert(self, index, item):
+        self._changed()
+        list.insert(self, index, item)
+
+    def reverse(self):
+        self._changed()
+        list.reverse(self)
+
     def __iter__(self, listiter=list.__iter__):
         self._resolve()
         return listiter(self)
@@ -56,14 +108,17 @@ class PdfArray(list):
 
     def remove(self, item):
         self._resolve()
+        self._changed()
         return list.remove(self, item)
 
     def sort(self, *args, **kw):
         self._resolve()
+        self._changed()
         return list.sort(self, *args, **kw)
 
     def pop(self, *args):
         self._resolve()
+        self._changed()
         return list.pop(self, *args)
 
     def __reversed__(self):
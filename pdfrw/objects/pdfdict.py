@@ -46,6 +46,31 @@ class _Private(object):
         vars(self.pdfdict)[name] = value
 
 
+class _DeferredStream(object):
+    ''' Stands in for the stream attribute of a PdfDict until
+        a stream is actually stored in the instance dictionary.
+        A reader that has not yet copied a stream out of the file
+        stores a zero-argument loader in the _streamloader
+        attribute instead; the first access calls it and caches
+        the result as an ordinary stream attribute, unless the
+        loader has a true keep_loader attribute, in which case it
+        is called every time (it keeps its own cache).
+    '''
+
+    def __get__(self, obj, cls, vars=vars, getattr=getattr):
+        if obj is None:
+            return None
+        objvars = vars(obj)
+        loader = objvars.get('_streamloader')
+        if loader is None:
+            return None
+        if getattr(loader, 'keep_loader', False):
+            return loader()
+        del objvars['_streamloader']
+        value = objvars['stream'] = loader()
+        return value
+
+
 class PdfDict(dict):
     ''' PdfDict objects are subclassed dictionaries
         with the following features:
@@ -87,6 +112,24 @@ class PdfDict(dict):
               and will also update the stream length.
             - _stream will store in the object's attribute dictionary without
               updating the stream length.
+            - _streamloader, if set, is called (with no arguments) the first
+              time the stream is accessed, to supply a stream that has not
+              yet been read in.
+            - _rawstream, if set, is an object whose original() method
+              returns a copy of this dictionary with its stream exactly
+              as it was read from the file.  It is discarded whenever
+              the stream is assigned, so its presence means the stream
+              has not been modified.  Its copy_to() method gives a new
+              copy of the dictionary the same stream.
+            - _onchange, if set, is called (with the dictionary as its
+              argument) and then discarded the first time the dictionary
+              is changed (by assigning, deleting, popping or updating
+              items, or clearing it), or the stream is assigned.  PdfReader
+              uses this to keep track of changed objects.
+            - _formatted, if set, is the output PdfWriter formatted
+              for the dictionary, which it reuses while _onchange
+              is still set.  It is only kept for dictionaries whose
+              values are all simple objects.
 
             It is possible, for example, to have a PDF name such as "/indirect"
             or "/stream", but you cannot access such a name as an attribute:
@@ -95,22 +138,53 @@ class PdfDict(dict):
                 mydict["/indirect"] -- accesses actual PDF dictionary
     '''
     indirect = False
-    stream = None
+    stream = _DeferredStream()
 
     _special = dict(indirect=('indirect', False),
                     stream=('stream', True),
                     _stream=('stream', False),
+                    _streamloader=('_streamloader', False),
+                    _onchange=('_onchange', False),
                     )
 
     def __setitem__(self, name, value, setter=dict.__setitem__,
-                    BasePdfName=BasePdfName, isinstance=isinstance):
+                    BasePdfName=BasePdfName, isinstance=isinstance,
+                    vars=vars):
         if not isinstance(name, BasePdfName):
             raise PdfParseError('Dict key %s is not a PdfName' % repr(name))
+        onchange = vars(self).pop('_onchange', None)
+        if onchange is not None:
+            onchange(self)
         if value is not None:
             setter(self, name, value)
         elif name in self:
             del self[name]
 
+    def _changed(self, vars=vars):
+        ''' Call (and discard) _onchange, if it is set.
+        '''
+        onchange = vars(self).pop('_onchange', None)
+        if onchange is not None:
+            onchange(self)
+
+    def __delitem__(self, name, deleter=dict.__delitem__):
+        self._changed()
+        deleter(self, name)
+
+    def update(self, *args, **kw):
+        self._changed()
+        dict.update(self, *args, **kw)
+
+    def setdefault(self, key, default=None):
+        value = self.get(key)
+        if value is None and default is not None:
+            self[key] = value = default
+        return value
+
+    def clear(self):
+        self._changed()
+        dict.clear(self)
+
     def __init__(self, *args, **kw):
         if args:
             if len(args) == 1:
@@ -118,7 +192,13 @@ class PdfDict(dict):
             self.update(args)
             if isinstance(args, PdfDict):
                 self.indirect = args.indirect
-                self._stream = args.stream
+                rawstream = vars(args).get('_rawstream')
+                if rawstream is not None:
+                    # Copy the stream as it was read, rather than
+                    # (maybe) decompressing it into the copy.
+                    rawstream.copy_to(self)
+                else:
+                    self._stream = args.stream
         for key, value in iteritems(kw):
             setattr(self, key, value)
 
@@ -144,7 +224,7 @@ class PdfDict(dict):
             if value is not None:
                 dict.__setitem__(self, key, value)
             else:
-                del self[key]
+                dict.__delitem__(self, key)
         return value
 
     def __getitem__(self, key):
@@ -161,6 +241,12 @@ class PdfDict(dict):
         else:
             name, setlen = info
             vars(self)[name] = value
+            if name == 'stream':
+                vars(self).pop('_streamloader', None)
+                vars(self).pop('_rawstream', None)
+                onchange = vars(self).pop('_onchange', None)
+                if onchange is not None:
+                    onchange(self)
             if setlen:
                 notnone = value is not None
                 self.Length = notnone and PdfObject(len(value)) or None
@@ -172,7 +258,11 @@ class PdfDict(dict):
         '''
         for key, value in list(dictiter(self)):
             if isinstance(value, PdfIndirect):
-                self[key] = value = value.real_value()
+                value = value.real_value()
+                if value is not None:
+                    dict.__setitem__(self, key, value)
+                else:
+                    dict.__delitem__(self, key)
             if value is not None:
                 if not isinstance(key, BasePdfName):
                     raise PdfParseError('Dict key %s is not a PdfName' %
@@ -203,15 +293,17 @@ class PdfDict(dict):
         return type(self)(self)
 
     def pop(self, key):
+        # (del goes through __delitem__, which calls _onchange)
         value = self.get(key)
         del self[key]
         return value
 
     def popitem(self):
-        key, value = dict.pop(self)
+        self._changed()
+        key, value = dict.popitem(self)
         if isinstance(value, PdfIndirect):
             value = value.real_value()
-        return value
+        return key, value
 
     def inheritable(self):
         ''' Search through ancestors as needed for inheritable
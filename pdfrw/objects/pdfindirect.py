@@ -20,3 +20,27 @@ class PdfIndirect(tuple):
         if value is NotLoaded:
             value = self.value = self._loader(self)
         return value
+
+
+def indirect_class(loader, PdfIndirect=PdfIndirect):
+    ''' Return a PdfIndirect subclass whose instances all use the
+        same loader.  Nothing is stored on the instances unless the
+        loader returns None, so their attribute dictionaries (which
+        are only allocated when first assigned to) are never created.
+        The loader must keep track of the objects it has already
+        loaded.
+    '''
+
+    class SharedLoaderIndirect(PdfIndirect):
+        _loader = staticmethod(loader)
+
+        def real_value(self, NotLoaded=_NotLoaded):
+            value = self.value
+            if value is NotLoaded:
+                value = self._loader(self)
+                if value is None:
+                    # Don't go looking for a missing object again
+                    self.value = value
+            return value
+
+    return SharedLoaderIndirect
@@ -0,0 +1,116 @@
+# A part of pdfrw (https://github.com/pmaupin/pdfrw)
+# Copyright (C) 2006-2015 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Support for PdfReader(lazy_pages=True).
+
+PageSequence presents the pages of a document as a read-only
+sequence, without walking the whole page tree when the file is
+opened.  Its length is the /Count of the root of the page tree,
+and finding a page uses the /Count of each intermediate node to
+go straight down to it, so only the nodes on the way (and the
+kids of each one, for their /Count values) are read.
+
+If the /Count values turn out not to match the tree, the whole
+tree is walked instead, the same as without lazy_pages.  From
+then on, the length is the number of pages actually found, and
+the recount callback, if one was given, is called with it.
+'''
+
+import bisect
+
+from .errors import log
+from .objects import PdfName
+
+
+class PageSequence(object):
+
+    def __init__(self, catalog, readpages, recount=None):
+        self.catalog = catalog
+        self.readpages = readpages
+        self.recount = recount
+        self.pages = None
+        # Cumulative page counts of the kids of each node
+        self.offsets = {}
+        try:
+            root = catalog.Pages
+            count = int(root.Count)
+            if root.Type != PdfName.Pages or count < 0:
+                raise ValueError
+        except (AttributeError, TypeError, ValueError):
+            self.walk()
+        else:
+            self.root = root
+            self.count = count
+
+    def walk(self, problem=None):
+        ''' Give up on /Count, and find all the pages.
+        '''
+        if problem is not None:
+            log.warning('%s; reading the whole page tree' % problem)
+        self.pages = self.readpages(self.catalog)
+        self.count = len(self.pages)
+        self.offsets = None
+        if self.recount is not None:
+            self.recount(self.count)
+
+    def kid_offsets(self, node):
+        offsets = self.offsets.get(id(node))
+        if offsets is None:
+            offsets = [0]
+            total = 0
+            for kid in node.Kids:
+                kidtype = kid.Type
+                if kidtype == PdfName.Page:
+                    total += 1
+                elif kidtype == PdfName.Pages:
+                    total += int(kid.Count)
+                else:
+                    raise ValueError('Expected /Page or /Pages dictionary, '
+                                     'got %s' % repr(kid))
+                offsets.append(total)
+            if total != int(node.Count):
+                raise ValueError('Page tree node has /Count %s, but %s '
+                                 'pages' % (node.Count, total))
+            self.offsets[id(node)] = offsets
+        return offsets
+
+    def findpage(self, index, bisect_right=bisect.bisect_right):
+        node = self.root
+        seen = set()
+        while node.Type == PdfName.Pages:
+            if id(node) in seen:
+                raise ValueError('Page tree has a loop')
+            seen.add(id(node))
+            offsets = self.kid_offsets(node)
+            kidnum = bisect_right(offsets, index) - 1
+            index -= offsets[kidnum]
+            node = node.Kids[kidnum]
+        if node.Type != PdfName.Page:
+            raise ValueError('Expected /Page dictionary, got %s' %
+                             repr(node))
+        return node
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index, isinstance=isinstance, slice=slice):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('page index out of range')
+        if self.pages is None:
+            try:
+                return self.findpage(index)
+            except (AttributeError, TypeError, ValueError) as s:
+                self.walk('Invalid page tree: %s' % s)
+        return self.pages[index]
+
+    def __iter__(self):
+        index = 0
+        while index < self.count:
+            yield self[index]
+            index += 1
@@ -9,32 +9,90 @@ parses the top-level container objects.  (It does not parse
 into streams.)  The object subclasses PdfDict, and the
 document pages are stored in a list in the pages attribute
 of the object.
+
+With mmap=True, the file is memory-mapped and parsed in
+place instead of being read into memory, and stream data
+is not copied out of the file until it is used.  (A file
+object is only mapped if it is positioned at the start of
+the file; otherwise it is read as usual.)  The reader can
+be used as a context manager, or close() can be called, to
+release the mapping when it is no longer needed.
+
+With random_access=True, a file name or seekable file object
+is read on demand instead: only the end of the file, the
+cross-reference sections, and the objects that are actually
+used are read, through a cache of file blocks.  (A file object
+is read from its current position.)  As with mmap, close()
+closes a file that the reader opened itself.
+
+With decompress='lazy', each compressed stream is only
+decompressed when it is first accessed, and streams that
+are never modified are written back out still compressed.
+
+With binary=True, the file data is tokenized as bytes,
+without first being decoded to a string, and stream data
+is kept as bytes all the way through to PdfWriter.
+
+With workers set to more than 1, PdfReader.uncompress()
+(and so decompress=True) and read_all() decompress streams
+using that many threads.
+
+With index_cache set to a directory name, the parsed
+cross-reference information is saved there, and later
+opens of the identical file skip cross-reference parsing.
+
+With first_page=True, a linearized file that is not all there
+(e.g. a partial download) is only read as far as its first page,
+which is then the only entry in pages.  Complete files, and files
+that are not linearized, are read normally.  The linearized
+attribute holds the linearization dictionary, if there is one.
+
+With lazy_pages=True, pages is a read-only sequence that only
+reads the parts of the page tree it needs to find the pages
+that are asked for.  (list(reader.pages) gives an ordinary list.)
+Its length comes from the page tree's /Count, unless that turns
+out to be wrong, in which case it (and numPages) change to the
+number of pages actually in the tree.
+
+Dictionaries and arrays read from the file note when they (or
+the direct dictionaries and arrays inside them) are changed, so
+that PdfWriter.write_incremental() can append just the changed
+objects to the original file.
 '''
 import gc
-import binascii
-import collections
+import mmap
+import array
+import struct
+import functools
 import itertools
 
 from .errors import PdfParseError, log
-from .tokens import PdfTokens
+from .tokens import PdfTokens, BinaryData
+from .blockfile import BlockFile
 from .objects import PdfDict, PdfArray, PdfName, PdfObject, PdfIndirect
-from .uncompress import uncompress
+from .objects.pdfindirect import indirect_class
+from .uncompress import uncompress, streamobjects, DecodeCache
 from . import crypt
+from . import xrefcache
+from .xreftable import OffsetTable, CompressedTable
+from .pagetree import PageSequence
 from .py23_diffs import convert_load, convert_store, iteritems
 
 
 class PdfReader(PdfDict):
 
-    def findindirect(self, objnum, gennum, PdfIndirect=PdfIndirect, int=int):
+    # Number of streams kept decompressed with decompress='lazy'
+    decode_cache_size = 64
+
+    def findindirect(self, objnum, gennum, int=int):
         ''' Return a previously loaded indirect object, or create
             a placeholder for it.
         '''
         key = int(objnum), int(gennum)
         result = self.indirect_objects.get(key)
         if result is None:
-            self.indirect_objects[key] = result = PdfIndirect(key)
-            self.deferred_objects.add(key)
-            result._loader = self.loadindirect
+            self.indirect_objects[key] = result = self.indirect_class(key)
+            self.deferred_objects.append(key)
         return result
 
     def readarray(self, source, PdfArray=PdfArray):
@@ -56,9 +114,13 @@ class PdfReader(PdfDict):
                 if func is not None:
                     value = func(source)
             append(value)
-        return PdfArray(result)
+        result = PdfArray(result)
+        onchange = self.owner_onchange
+        if onchange is not None:
+            result._onchange = onchange
+        return result
 
-    def readdict(self, source, PdfDict=PdfDict):
+    def readdict(self, source, PdfDict=PdfDict, setitem=dict.__setitem__):
         ''' Found a << token.  Parse the tokens after that.
         '''
         specialget = self.special.get
@@ -87,7 +149,15 @@ class PdfReader(PdfDict):
                         continue
                     value = self.findindirect(value, tok)
                     tok = next()
-            result[key] = value
+            # The key is a PdfName, and the new dictionary has
+            # no _onchange yet, so PdfDict.__setitem__ is not needed.
+            if value is not None:
+                setitem(result, key, value)
+            elif key in result:
+                del result[key]
+        onchange = self.owner_onchange
+        if onchange is not None:
+            result._onchange = onchange
         return result
 
     def empty_obj(self, source, PdfObject=PdfObject):
@@ -125,13 +195,32 @@ class PdfReader(PdfDict):
                                r"by \r without \n")
         return startstream
 
+    def setstream(self, obj, fdata, start, end, setlen=True,
+                  BinaryData=BinaryData, partial=functools.partial):
+        ''' Attach the stream data between start and end to obj.
+            If the file is being read in place (e.g. memory-mapped),
+            defer copying the data until the stream is first used,
+            and leave it undecoded if binary streams were requested.
+        '''
+        if not isinstance(fdata, BinaryData):
+            if setlen:
+                obj.stream = fdata[start:end]
+            else:
+                obj._stream = fdata[start:end]
+            return
+        getdata = fdata.data if self.binary else fdata
+        vars(obj).pop('stream', None)
+        obj._streamloader = partial(getdata.__getitem__, slice(start, end))
+        if setlen:
+            obj.Length = PdfObject(end - start)
+
     def readstream(self, obj, startstream, source, exact_required=False,
                    streamending='endstream endobj'.split(), int=int):
         fdata = source.fdata
         length = int(obj.Length)
         source.floc = target_endstream = startstream + length
         endit = source.multiple(2)
-        obj._stream = fdata[startstream:target_endstream]
+        self.setstream(obj, fdata, startstream, target_endstream, False)
         if endit == streamending:
             return
 
@@ -153,20 +242,21 @@ class PdfReader(PdfDict):
         if (length == room + 1 and
                 fdata[startstream - 2:startstream] == '\r\n'):
             source.warning(r"stream keyword terminated by \r without \n")
-            obj._stream = fdata[startstream - 1:target_endstream - 1]
+            self.setstream(obj, fdata, startstream - 1, target_endstream - 1,
+                           False)
             return
         source.floc = endstream
         if length > room:
             source.error('stream /Length attribute (%d) appears to '
                          'be too big (size %d) -- adjusting',
                          length, room)
-            obj.stream = fdata[startstream:endstream]
+            self.setstream(obj, fdata, startstream, endstream)
             return
         if fdata[target_endstream:endstream].rstrip():
             source.error('stream /Length attribute (%d) appears to '
                          'be too small (size %d) -- adjusting',
                          length, room)
-            obj.stream = fdata[startstream:endstream]
+            self.setstream(obj, fdata, startstream, endstream)
             return
         endobj = fdata.find('endobj', endstream, maxstream)
         if endobj < 0:
@@ -177,16 +267,46 @@ class PdfReader(PdfDict):
             return
         source.error('Illegal endstream/endobj combination')
 
-    def loadindirect(self, key, PdfDict=PdfDict,
+    def readowned(self, func, source, key, partial=functools.partial,
+                  isinstance=isinstance, vars=vars):
+        ''' Call func to parse the array or dictionary that is (or
+            starts) the indirect object key.  Direct dictionaries
+            and arrays inside it get an _onchange that marks the
+            indirect object as changed.  (The caller gives the
+            object itself its _onchange once it is all read.)
+        '''
+        objvars = vars(self)
+        outer = objvars['owner_onchange']
+        objvars['owner_onchange'] = partial(self.owner_changed, key)
+        try:
+            obj = func(source)
+        finally:
+            objvars['owner_onchange'] = outer
+        if isinstance(obj, (PdfDict, PdfArray)):
+            vars(obj).pop('_onchange', None)
+        return obj
+
+    def owner_changed(self, key, obj):
+        self.mark_changed(self.indirect_objects[key])
+
+    def loadindirect(self, key, PdfDict=PdfDict, PdfArray=PdfArray,
                      isinstance=isinstance):
         result = self.indirect_objects.get(key)
         if not isinstance(result, PdfIndirect):
             return result
         source = self.source
-        offset = int(self.source.obj_offsets.get(key, '0'))
+        offset = source.obj_offsets.get(key, 0)
         if not offset:
-            source.warning("Did not find PDF object %s", key)
-            return None
+            location = source.compressed_objects.get(key)
+            obj = location and self.load_stream_object(key, *location)
+            if obj is None:
+                source.warning("Did not find PDF object %s", key)
+                return None
+            self.indirect_objects[key] = obj
+            obj.indirect = key
+            if isinstance(obj, (PdfDict, PdfArray)):
+                obj._onchange = self._mark_changed
+            return obj
 
         # Read the object header and validate it
         objnum, gennum = key
@@ -217,22 +337,26 @@ class PdfReader(PdfDict):
         obj = source.next()
         func = self.special.get(obj)
         if func is not None:
-            obj = func(source)
+            obj = self.readowned(func, source, key)
 
         self.indirect_objects[key] = obj
-        self.deferred_objects.remove(key)
 
         # Mark the object as indirect, and
         # just return it if it is a simple object.
         obj.indirect = key
         tok = source.next()
         if tok == 'endobj':
+            if isinstance(obj, (PdfDict, PdfArray)):
+                obj._onchange = self._mark_changed
             return obj
 
         # Should be a stream.  Either that or it's broken.
         isdict = isinstance(obj, PdfDict)
         if isdict and tok == 'stream':
             self.readstream(obj, self.findstream(obj, tok, source), source)
+            if self.decode_cache is not None:
+                self.decode_cache.defer(obj)
+            obj._onchange = self._mark_changed
             return obj
 
         # Houston, we have a problem, but let's see if it
@@ -255,16 +379,28 @@ class PdfReader(PdfDict):
         self.indirect_objects[key] = obj
         return obj
 
+    def mark_changed(self, obj):
+        ''' Record that an object read from the file has been
+            changed, so that PdfWriter.write_incremental() will
+            write it back out.  This happens automatically when
+            the object, or a direct dictionary or array inside it,
+            is changed through its own methods, but must be done
+            explicitly for other changes (such as dict.__setitem__).
+        '''
+        self.changed_objects[obj.indirect] = obj
+        # PdfWriter can't reuse its earlier output for it
+        vars(obj).pop('_formatted', None)
+
     def read_all(self):
+        if self.workers > 1:
+            self.read_object_streams()
+        # Loading objects can find references to more objects,
+        # which findindirect() adds to the deferred list.  (It
+        # holds the same key tuples as indirect_objects, and
+        # keys already loaded are just skipped.)
         deferred = self.deferred_objects
-        prev = set()
-        while 1:
-            new = deferred - prev
-            if not new:
-                break
-            prev |= deferred
-            for key in new:
-                self.loadindirect(key)
+        while deferred:
+            self.loadindirect(deferred.pop())
 
     def decrypt_all(self):
         self.read_all()
@@ -277,50 +413,79 @@ class PdfReader(PdfDict):
     def uncompress(self):
         self.read_all()
 
-        uncompress(self.indirect_objects.values())
+        uncompress(self.indirect_objects.values(), workers=self.workers)
 
-    def load_stream_objects(self, object_streams):
-        # read object streams
+    def read_object_streams(self):
+        ''' Decrypt and decompress all the object streams that
+            have not been used yet, in one batch, so that they
+            can be decompressed in parallel.
+        '''
+        object_streams = self.object_streams
+        nums = set(num for num, index in
+                   self.source.compressed_objects.values())
         objs = []
-        for num in object_streams:
+        for num in sorted(nums - set(object_streams)):
             obj = self.findindirect(num, 0).real_value()
-            assert obj.Type == '/ObjStm'
-            objs.append(obj)
-
-        # read objects from stream
-        if objs:
-            # Decrypt
-            if self.crypt_filters is not None:
-                crypt.decrypt_objects(
-                    objs, self.stream_crypt_filter, self.crypt_filters)
-
-            # Decompress
-            uncompress(objs)
-
-            for obj in objs:
-                objsource = PdfTokens(obj.stream, 0, False)
-                next = objsource.next
-                offsets = []
-                firstoffset = int(obj.First)
-                while objsource.floc < firstoffset:
-                    offsets.append((int(next()), firstoffset + int(next())))
-                for num, offset in offsets:
-                    # Read the object, and call special code if it starts
-                    # an array or dictionary
-                    objsource.floc = offset
-                    sobj = next()
-                    func = self.special.get(sobj)
-                    if func is not None:
-                        sobj = func(objsource)
-
-                    key = (num, 0)
-                    self.indirect_objects[key] = sobj
-                    if key in self.deferred_objects:
-                        self.deferred_objects.remove(key)
-
-                    # Mark the object as indirect, and
-                    # add it to the list of streams if it starts a stream
-                    sobj.indirect = key
+            if isinstance(obj, PdfDict) and obj.Type == PdfName.ObjStm:
+                objs.append(obj)
+        if self.crypt_filters is not None:
+            crypt.decrypt_objects(
+                objs, self.stream_crypt_filter, self.crypt_filters)
+        uncompress(objs, workers=self.workers)
+
+    def read_object_stream(self, num):
+        ''' Decrypt and decompress an object stream, and return a
+            tokenizer for it, along with the (object number, offset)
+            table from the start of the stream.
+        '''
+        obj = self.findindirect(num, 0).real_value()
+        if not isinstance(obj, PdfDict) or obj.Type != PdfName.ObjStm:
+            self.source.warning('Expected object stream %s', (num, 0))
+            return None, []
+
+        # Decrypt
+        if self.crypt_filters is not None:
+            crypt.decrypt_objects(
+                [obj], self.stream_crypt_filter, self.crypt_filters)
+
+        # Decompress
+        uncompress([obj])
+
+        objsource = PdfTokens(obj.stream, 0, False)
+        next = objsource.next
+        offsets = []
+        firstoffset = int(obj.First)
+        while objsource.floc < firstoffset:
+            offsets.append((int(next()), firstoffset + int(next())))
+        return objsource, offsets
+
+    def load_stream_object(self, key, num, index):
+        ''' Read an object out of an object stream.  Each object
+            stream is only decompressed and indexed the first time
+            one of its objects is needed.
+        '''
+        object_streams = self.object_streams
+        objstream = object_streams.get(num)
+        if objstream is None:
+            objstream = object_streams[num] = self.read_object_stream(num)
+        objsource, offsets = objstream
+        objnum = key[0]
+        if index >= len(offsets) or offsets[index][0] != objnum:
+            offsets = [x for x in offsets if x[0] == objnum]
+            if not offsets:
+                self.source.warning("Did not find PDF object %s in "
+                                    "object stream %s", key, num)
+                return None
+            index = 0
+
+        # Read the object, and call special code if it starts
+        # an array or dictionary
+        objsource.floc = offsets[index][1]
+        obj = objsource.next()
+        func = self.special.get(obj)
+        if func is not None:
+            obj = self.readowned(func, objsource, key)
+        return obj
 
     def findxref(self, fdata):
         ''' Find the cross reference section at the end of a file
@@ -338,21 +503,87 @@ class PdfReader(PdfDict):
             source.exception('Expected %%EOF')
         return startloc, PdfTokens(fdata, int(tableloc), True, self.verbose)
 
-    def parse_xref_stream(self, source, int=int, range=range,
-                          enumerate=enumerate, islice=itertools.islice,
-                          defaultdict=collections.defaultdict,
-                          hexlify=binascii.hexlify):
-        ''' Parse (one of) the cross-reference file section(s)
+    def findlinearized(self, fdata):
+        ''' If the file is linearized, return its linearization
+            dictionary, and a tokenizer positioned at the
+            cross-reference section for the first page.
+            Otherwise, return None, None.
         '''
+        start = max(fdata.find('%PDF-'), 0)
+        if fdata.find('/Linearized', start, start + 1024) < 0:
+            return None, None
+        source = PdfTokens(fdata, start, True, self.verbose)
+        try:
+            objid = source.multiple(4)
+            ok = len(objid) == 4
+            ok = ok and objid[0].isdigit() and objid[1].isdigit()
+            ok = ok and objid[2] == 'obj' and objid[3] == '<<'
+            if ok:
+                linearized = self.readdict(source)
+                if (linearized.Linearized is not None and
+                        source.next() == 'endobj'):
+                    return linearized, source
+        except (PdfParseError, StopIteration):
+            pass
+        return None, None
 
-        def readint(s, lengths):
+    def read_first_page_xref(self, source):
+        ''' Read the cross-reference section for the first page of
+            a linearized file, without following /Prev to the main
+            cross-reference section at the end of the file.
+        '''
+        source.obj_offsets = OffsetTable()
+        source.compressed_objects = CompressedTable()
+        trailer, is_stream = self.parsexref(source)
+        trailer.Prev = None
+        return (source.obj_offsets, source.compressed_objects,
+                trailer, is_stream)
+
+    def xref_stream_fields(self, stream, entry_sizes, count,
+                           int=int, len=len, map=map, range=range,
+                           unpack=struct.unpack, repeat=itertools.repeat):
+        ''' Decode the first count entries of an xref stream
+            all at once.  Returns a sequence of values for each of
+            the three fields, or None if the stream is too short.
+            Missing fields default to 1 for the type, and 0 for
+            the others.
+        '''
+        rowlen = sum(entry_sizes)
+        size = rowlen * count
+        if len(stream) < size:
+            return None
+        stream = stream[:size]
+        codes = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+        present = [x for x in entry_sizes if x]
+        fields = []
+        if all(x in codes for x in present):
+            # Common widths such as [1 2 1] and [1 4 2]:
+            # unpack the whole table with a single struct call.
+            fmt = ''.join(codes[x] for x in present)
+            values = unpack('>' + fmt * count, stream) if fmt else ()
+            step = len(present)
+            for i in range(step):
+                fields.append(values[i::step])
+        else:
+            data = array.array('B', stream)
+            shift = lambda x, y: x << 8 | y
             offset = 0
-            for length in itertools.cycle(lengths):
-                next = offset + length
-                yield int(hexlify(s[offset:next]), 16) if length else None
-                offset = next
-
+            for length in present:
+                field = data[offset::rowlen].tolist()
+                for i in range(offset + 1, offset + length):
+                    field = list(map(shift, field, data[i::rowlen]))
+                fields.append(field)
+                offset += length
+        fields.reverse()
+        return [fields.pop() if length else repeat(default, count)
+                for length, default in zip(entry_sizes, (1, 0, 0))]
+
+    def parse_xref_stream(self, source, int=int, range=range, zip=zip,
+                          chain=itertools.chain.from_iterable):
+        ''' Parse (one of) the cross-reference file section(s)
+        '''
         setdefault = source.obj_offsets.setdefault
+        compressed_setdefault = source.compressed_objects.setdefault
         next = source.next
         # check for xref stream object
         objid = source.multiple(3)
@@ -376,23 +607,23 @@ class PdfReader(PdfDict):
         stream = stream if stream is not old_strm else convert_store(old_strm)
         num_pairs = obj.Index or PdfArray(['0', obj.Size])
         num_pairs = [int(x) for x in num_pairs]
-        num_pairs = zip(num_pairs[0::2], num_pairs[1::2])
+        num_pairs = list(zip(num_pairs[0::2], num_pairs[1::2]))
         entry_sizes = [int(x) for x in obj.W]
         if len(entry_sizes) != 3:
             source.exception('Invalid entry size')
-        object_streams = defaultdict(list)
-        get = readint(stream, entry_sizes)
-        for objnum, size in num_pairs:
-            for cnt in range(size):
-                xtype, p1, p2 = islice(get, 3)
-                if xtype in (1, None):
-                    if p1:
-                        setdefault((objnum, p2 or 0), p1)
-                elif xtype == 2:
-                    object_streams[p1].append((objnum, p2))
-                objnum += 1
-
-        obj.private.object_streams = object_streams
+        fields = self.xref_stream_fields(
+            stream, entry_sizes, sum(size for objnum, size in num_pairs))
+        if fields is None:
+            source.exception('Xref stream too short')
+        objnums = chain(range(objnum, objnum + size)
+                        for objnum, size in num_pairs)
+        for objnum, xtype, p1, p2 in zip(objnums, *fields):
+            if xtype == 1:
+                if p1:
+                    setdefault((objnum, p2), p1)
+            elif xtype == 2:
+                compressed_setdefault((objnum, 0), (p1, p2))
+
         return obj
 
     def parse_xref_table(self, source, int=int, range=range):
@@ -464,6 +695,68 @@ class PdfReader(PdfDict):
         else:
             source.exception('Expected "xref" keyword or xref stream object')
 
+    def readxrefs(self, source):
+        ''' Read all the cross-reference sections, starting with
+            the one at the current source location and following
+            the /Prev links back.  Returns the merged object offsets,
+            the merged locations of objects inside object streams,
+            the merged trailer, and whether the newest section was
+            an xref stream.
+        '''
+        # Find all the xref tables/streams, and
+        # then deal with them backwards.
+        xref_list = []
+        while 1:
+            source.obj_offsets = OffsetTable()
+            source.compressed_objects = CompressedTable()
+            trailer, is_stream = self.parsexref(source)
+            xref_list.append((source.obj_offsets, source.compressed_objects,
+                              trailer, is_stream))
+            prev = trailer.Prev
+            if prev is None:
+                token = source.next()
+                if token != 'startxref' and len(xref_list) == 1:
+                    source.warning('Expected "startxref" '
+                                   'at end of xref table')
+                break
+            source.floc = int(prev)
+
+        offsets, compressed, trailer, is_stream = xref_list.pop()
+        while xref_list:
+            later_offsets, later_compressed, later_trailer, is_stream = \
+                xref_list.pop()
+            # Later sections override earlier ones
+            for key in later_offsets:
+                compressed.pop(key, None)
+            for key in later_compressed:
+                offsets.pop(key, None)
+            offsets.update(later_offsets)
+            compressed.update(later_compressed)
+            if is_stream:
+                # (Don't resolve indirect references yet)
+                trailer.update(dict.items(later_trailer))
+            else:
+                trailer = later_trailer
+
+        trailer.Prev = None
+        return offsets, compressed, trailer, is_stream
+
+    def read_first_page(self, linearized):
+        ''' Return a list containing just the first page of a
+            linearized file, which the linearization dictionary
+            identifies directly, so that the page tree (which may
+            not have been read yet) is not needed.
+        '''
+        try:
+            page = self.findindirect(int(linearized.O), 0).real_value()
+        except (TypeError, ValueError):
+            page = None
+        if not isinstance(page, PdfDict) or page.Type != PdfName.Page:
+            log.error('Linearized file has no valid first page: %s' %
+                      repr(linearized.O))
+            return []
+        return [page]
+
     def readpages(self, node):
         pagename = PdfName.Page
         pagesname = PdfName.Pages
@@ -548,9 +841,55 @@ class PdfReader(PdfDict):
             source.warning(
                 'Unsupported Encrypt version: {}'.format(version))
 
+    def mapfile(self, fname):
+        ''' Memory-map a file name or file object so that it can
+            be parsed in place.  Returns None if the file cannot
+            be mapped (e.g. it is empty, or it is a file-like object
+            without an underlying file descriptor).
+        '''
+        try:
+            if hasattr(fname, 'read'):
+                if fname.tell():
+                    # The mapping would start before the
+                    # position the caller left the file at.
+                    return None
+                data = mmap.mmap(fname.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                with open(fname, 'rb') as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, ValueError, EnvironmentError):
+            return None
+        self.opened.append(data)
+        return BinaryData(data)
+
+    def openblocks(self, fname):
+        ''' Open a file name or seekable file object for reading
+            on demand, starting at the file object's current
+            position.  Returns None if that is not possible.
+        '''
+        try:
+            if hasattr(fname, 'read'):
+                return BinaryData(BlockFile(fname))
+            f = open(fname, 'rb')
+        except (AttributeError, ValueError, EnvironmentError):
+            return None
+        try:
+            data = BlockFile(f)
+        except (AttributeError, ValueError, EnvironmentError):
+            f.close()
+            return None
+        self.opened.append(data)
+        return BinaryData(data)
+
     def __init__(self, fname=None, fdata=None, decompress=False,
-                 decrypt=False, password='', disable_gc=True, verbose=True):
+                 decrypt=False, password='', disable_gc=True, verbose=True,
+                 mmap=False, binary=False, index_cache=None, workers=1,
+                 random_access=False, first_page=False, lazy_pages=False):
         self.private.verbose = verbose
+        self.private.binary = binary
+        self.private.workers = workers
+        # Things that close() releases
+        self.private.opened = []
 
         # Runs a lot faster with GC off.
         disable_gc = disable_gc and gc.isenabled()
@@ -560,10 +899,14 @@ class PdfReader(PdfDict):
         try:
             if fname is not None:
                 assert fdata is None
-                # Allow reading preexisting streams like pyPdf
-                if hasattr(fname, 'read'):
+                if random_access:
+                    fdata = self.openblocks(fname)
+                elif mmap:
+                    fdata = self.mapfile(fname)
+                if fdata is None and hasattr(fname, 'read'):
+                    # Allow reading preexisting streams like pyPdf
                     fdata = fname.read()
-                else:
+                elif fdata is None:
                     try:
                         f = open(fname, 'rb')
                         fdata = f.read()
@@ -573,14 +916,20 @@ class PdfReader(PdfDict):
                                             fname)
 
             assert fdata is not None
-            fdata = convert_load(fdata)
+            inplace = binary or isinstance(fdata, BinaryData)
+            if not inplace:
+                fdata = convert_load(fdata)
+            elif not isinstance(fdata, BinaryData):
+                fdata = BinaryData(convert_store(fdata))
 
             if not fdata.startswith('%PDF-'):
                 startloc = fdata.find('%PDF-')
                 if startloc >= 0:
                     log.warning('PDF header not at beginning of file')
                 else:
-                    lines = fdata.lstrip().splitlines()
+                    # Only look at the start, rather than
+                    # copying all of a mapped or on-demand file.
+                    lines = fdata[:1024].lstrip().splitlines()
                     if not lines:
                         raise PdfParseError('Empty PDF file!')
                     raise PdfParseError('Invalid PDF header: %s' %
@@ -588,19 +937,15 @@ class PdfReader(PdfDict):
 
             self.private.version = fdata[5:8]
 
-            endloc = fdata.rfind('%EOF')
-            if endloc < 0:
-                raise PdfParseError('EOF mark not found: %s' %
-                                    repr(fdata[-20:]))
-            endloc += 6
-            junk = fdata[endloc:]
-            fdata = fdata[:endloc]
-            if junk.rstrip('\00').strip():
-                log.warning('Extra data at end of file')
-
             private = self.private
             private.indirect_objects = {}
-            private.deferred_objects = set()
+            private.deferred_objects = []
+            private.owner_onchange = None
+            private.indirect_class = indirect_class(self.loadindirect)
+            private.object_streams = {}
+            private.decode_cache = None
+            private.changed_objects = {}
+            private._mark_changed = self.mark_changed
             private.special = {'<<': self.readdict,
                                '[': self.readarray,
                                'endobj': self.empty_obj,
@@ -608,27 +953,61 @@ class PdfReader(PdfDict):
             for tok in r'\ ( ) < > { } ] >> %'.split():
                 self.special[tok] = self.badtoken
 
-            startloc, source = self.findxref(fdata)
+            linearized, source = self.findlinearized(fdata)
+            private.linearized = linearized
+            if first_page and linearized is not None:
+                # If the whole file is there, just read it normally
+                first_page = len(fdata) < int(linearized.L or 0)
+            else:
+                first_page = False
+
+            if not first_page:
+                endloc = fdata.rfind('%EOF')
+                if endloc < 0:
+                    raise PdfParseError('EOF mark not found: %s' %
+                                        repr(fdata[-20:]))
+                endloc += 6
+                junk = fdata[endloc:]
+                if inplace:
+                    # Don't copy the buffer just to hide the junk
+                    fdata = BinaryData(fdata.data, endloc)
+                else:
+                    fdata = fdata[:endloc]
+                if junk.rstrip('\00').strip():
+                    log.warning('Extra data at end of file')
+
+            if first_page:
+                # The main cross-reference section is not used
+                private.startxref = None
+                offsets, compressed, trailer, is_stream = \
+                    self.read_first_page_xref(source)
+            else:
+                startloc, source = self.findxref(fdata)
+                private.startxref = source.floc
+                index = None
+                if index_cache is not None:
+                    index_key = xrefcache.cachekey(
+                        fdata, source.floc, fname)
+                    index = xrefcache.load(index_cache, index_key)
+                if index is None:
+                    offsets, compressed, trailer, is_stream = \
+                        self.readxrefs(source)
+                    if index_cache is not None:
+                        xrefcache.save(index_cache, index_key, offsets,
+                                       compressed, trailer, is_stream)
+                else:
+                    offsets, compressed, trailer, is_stream = index
+                    trailer = self.readdict(PdfTokens(trailer, 2, False))
+            private.xref_stream = is_stream
+            source.obj_offsets = offsets
+            source.compressed_objects = compressed
             private.source = source
 
-            # Find all the xref tables/streams, and
-            # then deal with them backwards.
-            xref_list = []
-            while 1:
-                source.obj_offsets = {}
-                trailer, is_stream = self.parsexref(source)
-                prev = trailer.Prev
-                if prev is None:
-                    token = source.next()
-                    if token != 'startxref' and not xref_list:
-                        source.warning('Expected "startxref" '
-                                       'at end of xref table')
-                    break
-                xref_list.append((source.obj_offsets, trailer, is_stream))
-                source.floc = int(prev)
-
             # Handle document encryption
             private.crypt_filters = None
+            lazy = decompress == 'lazy'
+            if lazy and not decrypt:
+                private.decode_cache = DecodeCache(self.decode_cache_size)
             if decrypt and PdfName.Encrypt in trailer:
                 identity_filter = crypt.IdentityCryptFilter()
                 crypt_filters = {
@@ -644,20 +1023,6 @@ class PdfReader(PdfDict):
 
                 self._parse_encrypt_info(source, password, trailer)
 
-            if is_stream:
-                self.load_stream_objects(trailer.object_streams)
-
-            while xref_list:
-                later_offsets, later_trailer, is_stream = xref_list.pop()
-                source.obj_offsets.update(later_offsets)
-                if is_stream:
-                    trailer.update(later_trailer)
-                    self.load_stream_objects(later_trailer.object_streams)
-                else:
-                    trailer = later_trailer
-
-            trailer.Prev = None
-
             if (trailer.Version and
                     float(trailer.Version) > float(self.version)):
                 self.private.version = trailer.Version
@@ -665,6 +1030,14 @@ class PdfReader(PdfDict):
             if decrypt:
                 self.decrypt_all()
                 trailer.Encrypt = None
+                if lazy:
+                    # Everything has been read in to decrypt it, so
+                    # only the decompression itself can be deferred.
+                    private.decode_cache = decode_cache = DecodeCache(
+                        self.decode_cache_size)
+                    for obj in streamobjects(
+                            list(self.indirect_objects.values())):
+                        decode_cache.defer(obj)
 
             if is_stream:
                 self.Root = trailer.Root
@@ -676,16 +1049,58 @@ class PdfReader(PdfDict):
                 self.update(trailer)
 
             # self.read_all_indirect(source)
-            private.pages = self.readpages(self.Root)
-            if decompress:
+            if first_page:
+                private.pages = self.read_first_page(linearized)
+            elif lazy_pages:
+                # Keeps numPages right if /Count turns out wrong
+                private.pages = PageSequence(
+                    self.Root, self.readpages,
+                    functools.partial(setattr, private, 'numPages'))
+            else:
+                private.pages = self.readpages(self.Root)
+            if decompress and not lazy:
                 self.uncompress()
 
             # For compatibility with pyPdf
             private.numPages = len(self.pages)
+        except Exception:
+            self.close()
+            raise
         finally:
             if disable_gc:
                 gc.enable()
 
+    def close(self):
+        ''' Release the memory map, or the file, that the reader
+            opened to read from.  (A file object that was passed
+            in is not closed.)  Objects that have not been read in
+            yet cannot be read after this.
+        '''
+        opened = self.opened or []
+        if opened and self.source is not None:
+            # The tokenizer's scanner holds on to the file data
+            self.source.iterator.close()
+        while opened:
+            item = opened.pop()
+            try:
+                item.close()
+            except BufferError:
+                # Something else that was scanning it is
+                # waiting to be garbage collected.
+                gc.collect()
+                try:
+                    item.close()
+                except BufferError:
+                    # Still in use (e.g. by a traceback); it
+                    # will be released when that goes away.
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     # For compatibility with pyPdf
     def getPage(self, pagenum):
         return self.pages[pagenum]
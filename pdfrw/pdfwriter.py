@@ -16,12 +16,16 @@ addpage() assumes that the pages are part of a valid
 tree/forest of PDF objects.
 '''
 import gc
+import struct
 
 from .objects import (PdfName, PdfArray, PdfDict, IndirectPdfDict,
                       PdfObject, PdfString)
 from .compress import compress as do_compress
+from .compact import find_unneeded, page_resources
+from .dedup import find_duplicates, find_shared_direct
 from .errors import PdfOutputError, log
-from .py23_diffs import iteritems, convert_store
+from .linearize import write_linearized
+from .py23_diffs import iteritems, convert_store, zlib
 
 NullObject = PdfObject('null')
 NullObject.indirect = True
@@ -45,20 +49,305 @@ def user_fmt(obj, isinstance=isinstance, float=float, str=str,
 
 
 def FormatObjects(f, trailer, version='1.3', compress=True, killobj=(),
-                  user_fmt=user_fmt, do_compress=do_compress,
+                  user_fmt=user_fmt, streaming=False, objstreams=False,
+                  objstream_size=100, update=None, workers=1,
+                  linearize=False, dedup=False, dedup_direct=False,
+                  compact=False, sort_keys=True, do_compress=do_compress,
                   convert_store=convert_store, iteritems=iteritems,
                   id=id, isinstance=isinstance, getattr=getattr, len=len,
-                  sum=sum, set=set, str=str, hasattr=hasattr, repr=repr,
+                  sum=sum, set=set, str=str, bytes=bytes, hasattr=hasattr,
+                  repr=repr, vars=vars,
                   enumerate=enumerate, list=list, dict=dict, tuple=tuple,
+                  range=range, max=max, pack=struct.pack,
                   PdfArray=PdfArray, PdfDict=PdfDict, PdfObject=PdfObject):
     ''' FormatObjects performs the actual formatting and disk write.
         Should be a class, was a class, turned into nested functions
         for performace (to reduce attribute lookups).
+
+        Normally, every object is formatted before anything is
+        written.  If streaming is True, each object is written
+        out as soon as it is formatted instead, and only its file
+        offset is retained.
+
+        Streams that a reader has not read in yet (see the
+        _streamloader attribute of PdfDict) are read into a
+        temporary copy of their dictionary when streaming, so
+        they do not stay in memory once they have been written.
+
+        If objstreams is True, non-stream objects are packed, up
+        to objstream_size at a time, into compressed object streams,
+        and the cross-reference table is written as a compressed
+        cross-reference stream (PDF 1.5).
+
+        If update is a PdfReader, f must be the file it was read
+        from, opened for appending.  Only the objects that have
+        changed since they were read, and any new objects, are
+        written, followed by a cross-reference section that
+        refers back to the original one.
+
+        If workers is more than 1, all the streams that need
+        compressing are found and compressed concurrently before
+        anything is formatted.
+
+        If linearize is True, the objects are renumbered and
+        written out in linearized order (PDF Reference, Annex F),
+        with everything needed to display the first page at the
+        front of the file.  Streaming is not possible in this mode.
+
+        If dedup is True, indirect objects that would be written
+        out exactly the same (e.g. the same font or image, read
+        from different files) are only written out once.
+
+        If dedup_direct is True, direct dictionaries and arrays
+        that would be written out more than once (e.g. the same
+        /Resources dictionary on every page) are made into shared
+        indirect objects, where that makes the file smaller.
+
+        If compact is True, only what can be reached from the
+        catalog and the document information dictionary is written.
+        Page thumbnails, and resources that no content stream uses,
+        are left out (see compact.py).
+
+        If sort_keys is False, dictionary keys are written in the
+        order they are stored, rather than in sorted order.
+
+        Dictionaries read from a file that have not been changed,
+        and that hold no arrays, dictionaries or references (which
+        could change without the dictionary being told), keep their
+        formatted output (in their _formatted attribute), so that
+        writing them out again does not reformat them.
     '''
 
     def f_write(s):
         f.write(convert_store(s))
 
+    def write_obj(objnum, x, gen=0):
+        ''' Write out a formatted object, and return its length.
+            Stream data is written directly rather than being
+            formatted into the object string.
+        '''
+        if isinstance(x, tuple):
+            x, stream = x
+            objstr = '%s %s obj\n%s\nstream\n' % (objnum, gen, x)
+            f_write(objstr)
+            stream = convert_store(stream)
+            f.write(stream)
+            f_write(stream_end)
+            return len(objstr) + len(stream) + len(stream_end)
+        objstr = '%s %s obj\n%s\nendobj\n' % (objnum, gen, x)
+        f_write(objstr)
+        return len(objstr)
+
+    def has_stream(obj):
+        ''' Return true if the PdfDict obj has a stream,
+            without reading in a stream that is not loaded yet.
+        '''
+        return '_streamloader' in vars(obj) or obj.stream is not None
+
+    def unloaded_copy(obj):
+        ''' Return a copy of obj with its stream read in, if that
+            has not happened yet; otherwise, return None.  This
+            leaves obj without a stream to keep in memory.
+        '''
+        loader = vars(obj).get('_streamloader')
+        if loader is None:
+            return None
+        result = PdfDict()
+        dict.update(result, obj)
+        result.indirect = obj.indirect
+        result._stream = loader()
+        return result
+
+    def new_objnum():
+        objlist_append(None)
+        return len(objlist) + base
+
+    def emit_obj(objnum, x, gen=0):
+        ''' Write out an object and record its cross-reference
+            entry.  In object stream mode, non-stream objects
+            are batched up and written out inside object streams.
+        '''
+        if (not objstreams or isinstance(x, tuple) or gen or
+                objnum == unpacked):
+            xref_entries[objnum] = 1, position[0], gen
+            position[0] += write_obj(objnum, x, gen)
+        else:
+            packed.append((objnum, x))
+            if len(packed) >= objstream_size:
+                flush_packed()
+
+    def flush_packed():
+        ''' Write all the batched objects out to an object stream
+        '''
+        if not packed:
+            return
+        objnum = new_objnum()
+        header = []
+        body = []
+        offset = 0
+        for i, (packednum, x) in enumerate(packed):
+            xref_entries[packednum] = 2, objnum, i
+            header.append('%s %s' % (packednum, offset))
+            body.append(x)
+            offset += len(x) + 1
+        header = space_join(header) + '\n'
+        data = zlib.compress(convert_store(header + '\n'.join(body)))
+        x = ('<</Filter /FlateDecode /First %s /Length %s /N %s '
+             '/Type /ObjStm>>' % (len(header), len(data), len(packed)))
+        xref_entries[objnum] = 1, position[0], 0
+        position[0] += write_obj(objnum, (x, data))
+        del packed[:]
+
+    def subsections(objnums):
+        ''' Return (start, count) runs of consecutive
+            object numbers for the cross-reference.
+        '''
+        result = []
+        for objnum in objnums:
+            if result and result[-1][0] + result[-1][1] == objnum:
+                result[-1][1] += 1
+            else:
+                result.append([objnum, 1])
+        return result
+
+    def write_xref_stream(prev=None):
+        ''' Write the cross-reference stream, which also
+            takes the place of the trailer.
+        '''
+        objnum = new_objnum()
+        xref_entries[objnum] = 1, position[0], 0
+        if prev is None:
+            xref_entries[0] = 0, 0, 65535
+        objnums = sorted(xref_entries)
+        entries = [xref_entries[x] for x in objnums]
+        widths = [1, 1, 1]
+        for i in (1, 2):
+            biggest = max(x[i] for x in entries)
+            while biggest >> (8 * widths[i]):
+                widths[i] += 1
+        data = b''.join(pack('>B', x[0]) +
+                        pack('>Q', x[1])[8 - widths[1]:] +
+                        pack('>Q', x[2])[8 - widths[2]:] for x in entries)
+        size = len(objlist) + base + 1
+        index = [x for run in subsections(objnums) for x in run]
+        xref = PdfDict(trailer)
+        xref.Type = PdfName.XRef
+        xref.Size = PdfObject(size)
+        xref.W = PdfArray([PdfObject(x) for x in widths])
+        xref.Filter = PdfName.FlateDecode
+        xref.DecodeParms = None
+        xref.Index = (index != [0, size] or None) and PdfArray(
+            [PdfObject(x) for x in index])
+        xref.Prev = prev
+        xref.stream = zlib.compress(data)
+        offset = position[0]
+        write_obj(objnum, format_obj(xref))
+        f_write('startxref\n%s\n%%%%EOF\n' % offset)
+
+    def write_xref_table(prev):
+        ''' Write a cross-reference table and trailer for
+            an incremental update.
+        '''
+        offset = position[0]
+        f_write('xref\n')
+        objnums = sorted(xref_entries)
+        for start, count in subsections(objnums):
+            f_write('%s %s\n' % (start, count))
+            for objnum in range(start, start + count):
+                f_write('%010d %05d n\r\n' % xref_entries[objnum][1:])
+        newtrailer = PdfDict(trailer)
+        newtrailer.Size = PdfObject(len(objlist) + base + 1)
+        newtrailer.Prev = prev
+        f_write('trailer\n\n%s\nstartxref\n%s\n%%%%EOF\n' %
+                (format_obj(newtrailer), offset))
+
+    def find_streams():
+        ''' Return all the stream objects that will be written
+            out and still need to be compressed.
+        '''
+        result = []
+        stack = [trailer]
+        changed = ()
+        if update is not None:
+            changed = update.changed_objects
+            stack += [obj for key, obj in sorted(iteritems(changed))
+                      if original(key) is obj]
+        seen = set()
+        while stack:
+            obj = stack.pop()
+            objid = id(obj)
+            if objid in seen:
+                continue
+            seen.add(objid)
+            swapped = swapobj(objid)
+            if swapped is not None:
+                stack.append(swapped)
+                continue
+            indirect = getattr(obj, 'indirect', False)
+            if (original is not None and isinstance(indirect, tuple) and
+                    original(indirect) is obj and indirect not in changed):
+                continue
+            if isinstance(obj, dict):
+                if (isinstance(obj, PdfDict) and
+                        '_rawstream' not in vars(obj) and
+                        not (streaming and
+                             '_streamloader' in vars(obj)) and
+                        obj.Filter is None and obj.stream):
+                    result.append(obj)
+                stack.extend(obj.values())
+            elif isinstance(obj, (list, tuple)):
+                stack.extend(obj)
+        return result
+
+    def is_indirect(obj):
+        ''' Return true if add() will make obj an indirect object.
+        '''
+        if isinstance(obj, PdfDict):
+            return obj.indirect or has_stream(obj)
+        return getattr(obj, 'indirect', False)
+
+    def resolve(obj):
+        ''' Return the object that will be written out for obj.
+        '''
+        swapped = swapobj(id(obj))
+        return obj if swapped is None else swapped
+
+    def as_written(obj):
+        ''' Return the PdfDict obj, or a copy of it, with the
+            stream that will be written out for it.
+        '''
+        rawstream = vars(obj).get('_rawstream')
+        if rawstream is not None:
+            # Unmodified since it was read, so write
+            # it back out without decompressing it.
+            return rawstream.original()
+        if streaming:
+            return unloaded_copy(obj) or obj
+        return obj
+
+    def find_compacted():
+        ''' Return a dict mapping the id of each object that has
+            something in it that compact leaves out to a copy
+            without it.
+        '''
+        result = find_unneeded((trailer.Root, trailer.Info), resolve,
+                               is_indirect)
+        # Objects that were already being swapped for
+        # one of these get swapped for the copy instead.
+        for objid, obj in list(swapped.items()):
+            obj = result.get(id(obj))
+            if obj is not None:
+                result[objid] = obj
+        return result
+
+    def share_direct(add_object):
+        ''' Wrap add() so that it replaces direct objects
+            with the shared objects found for them.
+        '''
+        def add(obj):
+            return add_object(direct_swap(id(obj), obj))
+        return add
+
     def add(obj):
         ''' Add an object to our list, if it's an indirect
             object.  Just format it if not.
@@ -68,7 +357,7 @@ def FormatObjects(f, trailer, version='1.3', compress=True, killobj=(),
 
         # Automatically set stream objects to indirect
         if isinstance(obj, PdfDict):
-            indirect = obj.indirect or (obj.stream is not None)
+            indirect = obj.indirect or has_stream(obj)
         else:
             indirect = getattr(obj, 'indirect', False)
 
@@ -84,6 +373,12 @@ def FormatObjects(f, trailer, version='1.3', compress=True, killobj=(),
             leaving(objid)
             return result
 
+        # Unchanged objects from a file being updated are
+        # just referenced; changed ones are written separately.
+        if (original is not None and isinstance(indirect, tuple) and
+                original(indirect) is obj):
+            return '%s %s R' % indirect
+
         objnum = indirect_dict_get(objid)
 
         # If we haven't seen the object yet, we need to
@@ -98,17 +393,21 @@ def FormatObjects(f, trailer, version='1.3', compress=True, killobj=(),
                 if objnum is not None:
                     indirect_dict[old_id] = objnum
                     return '%s 0 R' % objnum
-            objnum = len(objlist) + 1
-            objlist_append(None)
+            objnum = new_objnum()
             indirect_dict[objid] = objnum
-            deferred.append((objnum - 1, obj))
+            deferred.append((objnum - 1 - base, obj))
         return '%s 0 R' % objnum
 
-    def format_array(myarray, formatter):
-        # Format array data into semi-readable ASCII
-        if sum([len(x) for x in myarray]) <= 70:
-            return formatter % space_join(myarray)
-        return format_big(myarray, formatter)
+    def format_array(parts, numitems):
+        # Format array data into semi-readable ASCII.  The parts
+        # are the opening bracket, and then each item followed by
+        # a space, except that the closing bracket follows the last.
+        start = parts[0]
+        end = parts[-1]
+        result = join(parts)
+        if len(result) < 70 + numitems + len(start) + len(end):
+            return result
+        return format_big(parts[1:-1:2], start + '%s' + end)
 
     def format_big(myarray, formatter):
         bigarray = []
@@ -123,6 +422,14 @@ def FormatObjects(f, trailer, version='1.3', compress=True, killobj=(),
             subarray.append(x)
         return formatter % lf_join([space_join(x) for x in bigarray])
 
+    def close_array(parts, end):
+        numitems = len(parts) // 2
+        if numitems:
+            parts[-1] = end
+        else:
+            parts.append(end)
+        return format_array(parts, numitems)
+
     def format_obj(obj):
         ''' format PDF object data into semi-readable ASCII.
             May mutually recurse with add() -- add() will
@@ -132,22 +439,39 @@ def FormatObjects(f, trailer, version='1.3', compress=True, killobj=(),
         while 1:
             if isinstance(obj, (list, dict, tuple)):
                 if isinstance(obj, PdfArray):
-                    myarray = [add(x) for x in obj]
-                    return format_array(myarray, '[%s]')
+                    parts = ['[']
+                    for x in obj:
+                        parts += add(x), ' '
+                    return close_array(parts, ']')
                 elif isinstance(obj, PdfDict):
+                    objvars = vars(obj)
+                    unchanged = format_key is not None and (
+                        '_onchange' in objvars)
+                    if unchanged:
+                        cached = objvars.get('_formatted')
+                        if cached is not None and cached[0] == format_key:
+                            return cached[1]
+                    obj = as_written(obj)
                     if compress and obj.stream:
                         do_compress([obj])
-                    pairs = sorted((getattr(x, 'encoded', None) or x, y)
-                                   for (x, y) in obj.iteritems())
-                    myarray = []
+                    pairs = obj.iteritems()
+                    if sort_keys:
+                        pairs = sorted((getattr(x, 'encoded', None) or x, y)
+                                       for (x, y) in pairs)
+                    parts = ['<<']
                     for key, value in pairs:
-                        myarray.append(key)
-                        myarray.append(add(value))
-                    result = format_array(myarray, '<<%s>>')
+                        parts += (getattr(key, 'encoded', None) or key, ' ',
+                                  add(value), ' ')
+                    result = close_array(parts, '>>')
                     stream = obj.stream
                     if stream is not None:
-                        result = ('%s\nstream\n%s\nendstream' %
-                                  (result, stream))
+                        return result, stream
+                    if unchanged and ' R' not in result and not [
+                            x for x in dict.values(obj)
+                            if isinstance(x, (list, dict, tuple))]:
+                        # Nothing in it depends on object numbering,
+                        # or can be changed without notifying obj.
+                        objvars['_formatted'] = format_key, result
                     return result
                 obj = (PdfArray, PdfDict)[isinstance(obj, dict)](obj)
                 continue
@@ -161,19 +485,105 @@ def FormatObjects(f, trailer, version='1.3', compress=True, killobj=(),
     def format_deferred():
         while deferred:
             index, obj = deferred.pop()
-            objlist[index] = format_obj(obj)
+            if streaming and objstreams:
+                emit_obj(index + 1, format_obj(obj))
+            elif streaming:
+                objlist[index] = position[0]
+                position[0] += write_obj(index + 1, format_obj(obj))
+            else:
+                objlist[index] = format_obj(obj)
+
+    def record_links(add_object):
+        ''' Wrap add() so that it also records the number of
+            each indirect object referred to, in links[0].
+        '''
+        def add(obj):
+            result = add_object(obj)
+            objnum = objnum_of(obj)
+            if objnum is not None:
+                links[0].append(objnum)
+            return result
+        return add
+
+    def format_linked():
+        ''' Like format_deferred(), but keep the objects, and the
+            numbers of the objects that each one refers to, rather
+            than the formatted output, which will be redone after
+            the objects have been renumbered.
+        '''
+        while deferred:
+            index, obj = deferred.pop()
+            objects[index + 1] = obj
+            links[0] = references[index + 1] = []
+            format_obj(obj)
+
+    def object_size(objnum, x):
+        ''' Return the length write_obj() will write for an object.
+        '''
+        if isinstance(x, tuple):
+            x, stream = x
+            return (len('%s 0 obj\n%s\nstream\n' % (objnum, x)) +
+                    len(convert_store(stream)) + len(stream_end))
+        return len('%s 0 obj\n%s\nendobj\n' % (objnum, x))
+
+    def objnum_of(obj):
+        ''' Return the number of the indirect object written
+            out for obj, or None if there is not one (yet).
+        '''
+        objid = id(obj)
+        objnum = indirect_dict_get(objid)
+        if objnum is None:
+            objnum = indirect_dict_get(id(swapobj(objid)))
+        return objnum
+
+    def renumber_objects(renumber):
+        ''' Give each indirect object the new number for it in
+            renumber, for write_linearized() to format them again.
+        '''
+        for objid, objnum in list(iteritems(indirect_dict)):
+            indirect_dict[objid] = renumber[objnum]
+        links[0] = []
 
     indirect_dict = {}
     indirect_dict_get = indirect_dict.get
     objlist = []
     objlist_append = objlist.append
+    # Formatted output cached in unchanged dictionaries
+    # from an earlier write is only reused if it was
+    # formatted the same way.
+    format_key = None if dedup_direct else (user_fmt, sort_keys)
+
     visited = set()
     visiting = visited.add
     leaving = visited.remove
+    join = ''.join
     space_join = ' '.join
     lf_join = '\n  '.join
+    stream_end = '\nendstream\nendobj\n'
 
     deferred = []
+    packed = []
+    xref_entries = {}
+
+    # For linearization
+    objects = {}
+    references = {}
+    links = [[]]
+
+    # When updating a file, objects that were read from
+    # it keep their object numbers, and new objects are
+    # numbered after them.
+    base = 0
+    original = None
+    if update is not None:
+        base = int(update.Size) - 1
+        original = update.indirect_objects.get
+        streaming = False
+
+    if compact and update is None:
+        # Nothing else the old trailer refers to is needed.
+        trailer = PdfDict(Root=trailer.Root, Info=trailer.Info,
+                          ID=trailer.ID, Encrypt=trailer.Encrypt)
 
     # Don't reference old catalog or pages objects --
     # swap references to new ones.
@@ -181,39 +591,109 @@ def FormatObjects(f, trailer, version='1.3', compress=True, killobj=(),
                PdfName.Pages: trailer.Root.Pages, None: trailer}.get
     swapobj = [(objid, type_remap(obj.Type) if new_obj is None else new_obj)
                for objid, (obj, new_obj) in iteritems(killobj)]
-    swapobj = dict((objid, obj is None and NullObject or obj)
-                   for objid, obj in swapobj).get
+    swapped = dict((objid, obj is None and NullObject or obj)
+                   for objid, obj in swapobj)
+    swapobj = swapped.get
 
     for objid in killobj:
         assert swapobj(objid) is not None
 
-    # The first format of trailer gets all the information,
-    # but we throw away the actual trailer formatting.
-    format_obj(trailer)
+    if compact and update is None:
+        swapped.update(find_compacted())
+
+    if dedup and update is None:
+        swapped.update(find_duplicates(trailer, resolve, is_indirect,
+                                       as_written, user_fmt))
+
+    if linearize:
+        streaming = False
+        add = record_links(add)
+
+    if dedup_direct and update is None:
+        direct_swap = find_shared_direct(trailer, resolve, is_indirect,
+                                         user_fmt).get
+        add = share_direct(add)
+
+    if compress and workers > 1:
+        do_compress(find_streams(), workers)
+        compress = False
+
+    header = '%%PDF-%s\n%%\xe2\xe3\xcf\xd3\n' % version
+    position = [len(header)]
+    if streaming:
+        f_write(header)
+
+    # Find everything the trailer refers to.  The trailer
+    # itself is formatted at the end, when its size is known.
+    pairs = trailer.iteritems()
+    if sort_keys:
+        pairs = sorted(pairs)
+    for key, value in pairs:
+        add(value)
+    # The encryption dictionary may not go in an object stream.
+    unpacked = indirect_dict_get(id(trailer.Encrypt))
     # Keep formatting until we're done.
     # (Used to recurse inside format_obj for this, but
     #  hit system limit.)
+    if linearize:
+        format_linked()
+        write_linearized(trailer, header, objects, references, objnum_of,
+                         renumber_objects, format_obj, write_obj,
+                         object_size, f_write)
+        return
     format_deferred()
+
+    if update is not None:
+        # Only the changed objects and any new objects they
+        # reference are appended to the end of the file.
+        updated = []
+        for key, obj in sorted(iteritems(update.changed_objects)):
+            if original(key) is obj:
+                updated.append((key, format_obj(obj)))
+                format_deferred()
+        position[0] = f.tell()
+        for (objnum, gen), x in updated:
+            emit_obj(objnum, x, gen)
+        for index in range(len(objlist)):
+            emit_obj(index + 1 + base, objlist[index])
+        prev = PdfObject(update.startxref)
+        if objstreams or update.xref_stream:
+            flush_packed()
+            write_xref_stream(prev)
+        else:
+            write_xref_table(prev)
+        return
+
+    if objstreams:
+        if not streaming:
+            f_write(header)
+            for index in range(len(objlist)):
+                emit_obj(index + 1, objlist[index])
+        flush_packed()
+        write_xref_stream()
+        return
+
     # Now we know the size, so we update the trailer dict
     # and get the formatted data.
     trailer.Size = PdfObject(len(objlist) + 1)
     trailer = format_obj(trailer)
 
-    # Now we have all the pieces to write out to the file.
-    # Keep careful track of the counts while we do it so
-    # we can correctly build the cross-reference.
-
-    header = '%%PDF-%s\n%%\xe2\xe3\xcf\xd3\n' % version
-    f_write(header)
-    offset = len(header)
     offsets = [(0, 65535, 'f')]
     offsets_append = offsets.append
 
-    for i, x in enumerate(objlist):
-        objstr = '%s 0 obj\n%s\nendobj\n' % (i + 1, x)
-        offsets_append((offset, 0, 'n'))
-        offset += len(objstr)
-        f_write(objstr)
+    if streaming:
+        for offset in objlist:
+            offsets_append((offset, 0, 'n'))
+        offset = position[0]
+    else:
+        # Now we have all the pieces to write out to the file.
+        # Keep careful track of the counts while we do it so
+        # we can correctly build the cross-reference.
+        f_write(header)
+        offset = len(header)
+        for i, x in enumerate(objlist):
+            offsets_append((offset, 0, 'n'))
+            offset += write_obj(i + 1, x)
 
     f_write('xref\n0 %s\n' % len(offsets))
     for x in offsets:
@@ -226,16 +706,72 @@ class PdfWriter(object):
     _trailer = None
     canonicalize = False
     fname = None
+    streaming = False
+    objstreams = False
+    workers = 1
+    linearize = False
+    pagetree_fanout = None
+    dedup = False
+    dedup_direct = False
+    compact = False
+    prune_resources = False
+    sort_keys = True
 
     def __init__(self, fname=None, version='1.3', compress=False, **kwargs):
         """
             Parameters:
                 fname -- Output file name, or file-like binary object
                          with a write method
-                version -- PDF version to target.  Currently only 1.3
-                           supported.
+                version -- PDF version to target.  Only affects the
+                           file header; raised to 1.5 if objstreams
+                           is set.
                 compress -- True to do compression on output.  Currently
                             compresses stream objects.
+                streaming -- True to write each object out as soon as
+                             it is formatted, rather than holding the
+                             formatted output for the entire file in
+                             memory until the end.  Object numbers
+                             are unchanged, but objects appear in
+                             the file in the order they are formatted
+                             rather than in object number order.
+                objstreams -- True to pack objects into compressed
+                              object streams and write a compressed
+                              cross-reference stream.  This makes the
+                              output PDF 1.5 or later.
+                workers -- Number of threads to use to compress
+                           streams.  The output is the same as
+                           with a single thread.
+                linearize -- True to write a linearized PDF, which
+                             can display its first page before the
+                             rest of the file has been downloaded.
+                             Objects are renumbered.  Cannot be used
+                             with objstreams, and streaming is
+                             ignored.
+                pagetree_fanout -- The most kids a node of the page
+                                   tree may have.  Documents with
+                                   more pages than this get a
+                                   balanced tree of /Pages nodes
+                                   instead of a single one.
+                dedup -- True to write out identical objects (such
+                         as the same font or image used in several
+                         input files) only once.
+                dedup_direct -- True to make direct dictionaries
+                                and arrays that appear more than
+                                once into shared indirect objects,
+                                where that makes the file smaller.
+                compact -- True to leave out anything that cannot be
+                           reached from the catalog or document
+                           information dictionary, page thumbnails,
+                           and unused entries in /Resources
+                           dictionaries.
+                prune_resources -- True to give each page that is
+                                   added only the resources that its
+                                   content stream uses, rather than
+                                   the whole /Resources dictionary it
+                                   shares with other pages.
+                sort_keys -- False to write dictionary keys in the
+                             order they were added, which is faster
+                             than sorting them.
         """
 
         # Legacy support:  fname is new, was added in front
@@ -262,6 +798,11 @@ class PdfWriter(object):
                                      "on PdfWriter instance" % name)
                 setattr(self, name, value)
 
+        fanout = self.pagetree_fanout
+        if fanout and not (isinstance(fanout, int) and fanout >= 2):
+            raise ValueError("pagetree_fanout must be None, 0 or "
+                             "an integer of at least 2, not %r" % fanout)
+
         self.pagearray = PdfArray()
         self.killobj = {}
 
@@ -271,10 +812,13 @@ class PdfWriter(object):
             raise PdfOutputError('Bad /Type:  Expected %s, found %s'
                                  % (PdfName.Page, page.Type))
         inheritable = page.inheritable  # searches for resources
+        resources = inheritable.Resources
+        if self.prune_resources:
+            resources = page_resources(page, resources)
         self.pagearray.append(
             IndirectPdfDict(
                 page,
-                Resources=inheritable.Resources,
+                Resources=resources,
                 MediaBox=inheritable.MediaBox,
                 CropBox=inheritable.CropBox,
                 Rotate=inheritable.Rotate,
@@ -313,22 +857,48 @@ class PdfWriter(object):
         trailer = PdfDict(
             Root=IndirectPdfDict(
                 Type=PdfName.Catalog,
-                Pages=IndirectPdfDict(
-                    Type=PdfName.Pages,
-                    Count=PdfObject(len(self.pagearray)),
-                    Kids=self.pagearray
-                )
+                Pages=self.make_pagetree(self.pagearray)
             )
         )
-        # Make all the pages point back to the page dictionary and
-        # ensure they are indirect references
-        pagedict = trailer.Root.Pages
-        for page in pagedict.Kids:
-            page.Parent = pagedict
-            page.indirect = True
         self._trailer = trailer
         return trailer
 
+    def make_pagetree(self, pages):
+        ''' Return the root of a page tree for the pages.  If
+            there are more than pagetree_fanout pages, the tree
+            is balanced, with no more than pagetree_fanout kids
+            in each node.
+        '''
+        fanout = self.pagetree_fanout
+        kids = pages
+        counts = [1] * len(pages)
+        while fanout and len(kids) > fanout:
+            numnodes = -(-len(kids) // fanout)
+            nodes = []
+            nodecounts = []
+            for i in range(numnodes):
+                start = i * len(kids) // numnodes
+                end = (i + 1) * len(kids) // numnodes
+                nodecounts.append(sum(counts[start:end]))
+                nodes.append(self.make_pagenode(kids[start:end],
+                                                nodecounts[-1]))
+            kids = PdfArray(nodes)
+            counts = nodecounts
+        return self.make_pagenode(kids, len(pages))
+
+    def make_pagenode(self, kids, count):
+        node = IndirectPdfDict(
+            Type=PdfName.Pages,
+            Count=PdfObject(count),
+            Kids=kids
+        )
+        # Make all the kids point back to the node and
+        # ensure they are indirect references
+        for kid in kids:
+            kid.Parent = node
+            kid.indirect = True
+        return node
+
     def _set_trailer(self, trailer):
         self._trailer = trailer
 
@@ -346,6 +916,10 @@ class PdfWriter(object):
 
         fname = fname or self.fname
 
+        if self.linearize and self.objstreams:
+            raise PdfOutputError(
+                "PdfWriter cannot linearize with objstreams")
+
         # Dump the data.  We either have a filename or a preexisting
         # file object.
         preexisting = hasattr(fname, 'write')
@@ -353,9 +927,70 @@ class PdfWriter(object):
         if disable_gc:
             gc.disable()
 
+        version = self.version
+        if self.objstreams and float(version) < 1.5:
+            version = '1.5'
+
+        try:
+            FormatObjects(f, trailer, version, self.compress,
+                          self.killobj, user_fmt=user_fmt,
+                          streaming=self.streaming,
+                          objstreams=self.objstreams,
+                          workers=self.workers,
+                          linearize=self.linearize,
+                          dedup=self.dedup,
+                          dedup_direct=self.dedup_direct,
+                          compact=self.compact,
+                          sort_keys=self.sort_keys)
+        finally:
+            if not preexisting:
+                f.close()
+            if disable_gc:
+                gc.enable()
+
+    def write_incremental(self, fname=None, trailer=None, user_fmt=user_fmt,
+                          disable_gc=True):
+        ''' Update a PDF file in place, by appending the objects
+            that have changed since it was read, any new objects
+            they refer to, and a new cross-reference section.
+
+            The trailer must be the PdfReader instance that read
+            the file, and the file must not have been changed since.
+        '''
+        trailer = trailer or self.trailer
+        if vars(trailer).get('changed_objects') is None:
+            raise PdfOutputError('Incremental update requires the '
+                                 'PdfReader of the original file')
+        if (trailer.Encrypt is not None or
+                vars(trailer).get('crypt_filters') is not None):
+            raise PdfOutputError('Cannot incrementally update an '
+                                 'encrypted PDF')
+        if vars(trailer).get('startxref') is None:
+            raise PdfOutputError('Cannot incrementally update a PDF '
+                                 'that was only read to its first page')
+
+        if (fname is not None) == (self.fname is not None):
+            raise PdfOutputError(
+                "PdfWriter fname must be specified exactly once")
+
+        fname = fname or self.fname
+
+        preexisting = hasattr(fname, 'write')
+        f = preexisting and fname or open(fname, 'r+b')
+        if disable_gc:
+            gc.disable()
+
         try:
+            # Make sure the update starts on a new line
+            f.seek(-1, 2)
+            if f.read(1) not in b'\r\n':
+                f.seek(0, 2)
+                f.write(b'\n')
+            f.seek(0, 2)
             FormatObjects(f, trailer, self.version, self.compress,
-                          self.killobj, user_fmt=user_fmt)
+                          self.killobj, user_fmt=user_fmt,
+                          objstreams=self.objstreams, update=trailer,
+                          workers=self.workers)
         finally:
             if not preexisting:
                 f.close()
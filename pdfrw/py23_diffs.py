@@ -4,6 +4,8 @@
 
 # Deal with Python2/3 differences
 
+import array
+
 try:
     import zlib
 except ImportError:
@@ -19,7 +21,9 @@ except NameError:
         return s
 
     def convert_store(s):
-        return s.encode('Latin-1')
+        if isinstance(s, str):
+            return s.encode('Latin-1')
+        return s
 
     def from_array(a):
         return a.tobytes()
@@ -51,3 +55,22 @@ try:
     intern = intern
 except NameError:
     from sys import intern
+
+try:
+    from itertools import accumulate
+except ImportError:
+
+    def accumulate(iterable):
+        total = 0
+        for x in iterable:
+            total += x
+            yield total
+
+try:
+    array.array('q')
+except ValueError:
+    # Python 2 has no long long arrays, but long is
+    # 64 bits on most platforms.
+    int64_typecode = 'l'
+else:
+    int64_typecode = 'q'
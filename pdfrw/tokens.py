@@ -15,7 +15,56 @@ import itertools
 from .objects import PdfString, PdfObject
 from .objects.pdfname import BasePdfName
 from .errors import log, PdfParseError
-from .py23_diffs import nextattr, intern
+from .blockfile import BlockFile
+from .py23_diffs import nextattr, intern, convert_load, convert_store
+
+
+class BinaryData(object):
+    ''' Wraps a bytes-like buffer (bytes, or an mmap of the
+        file) so that it can be handed to PdfTokens and PdfReader
+        in place of a decoded string.  Only the subset of the
+        string interface used by the parser is supported, and
+        only the parts that are actually sliced out get decoded.
+        The optional end parameter hides trailing data without
+        copying the buffer.
+    '''
+
+    def __init__(self, data, end=None):
+        self.data = data
+        self.end = len(data) if end is None else min(end, len(data))
+
+    def __len__(self):
+        return self.end
+
+    def __getitem__(self, index, slice=slice, isinstance=isinstance):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.end)
+            return convert_load(self.data[start:stop:step])
+        if index < 0:
+            index += self.end
+        return convert_load(self.data[index:index + 1])
+
+    def find(self, sub, start=0, end=None):
+        if end is None or end > self.end:
+            end = self.end
+        return self.data.find(convert_store(sub), start, end)
+
+    def rfind(self, sub, start=0, end=None):
+        if end is None or end > self.end:
+            end = self.end
+        return self.data.rfind(convert_store(sub), start, end)
+
+    def rindex(self, sub, start=0, end=None):
+        result = self.rfind(sub, start, end)
+        if result < 0:
+            raise ValueError('substring not found')
+        return result
+
+    def count(self, sub, start=0, end=None):
+        return self[start:end].count(sub)
+
+    def startswith(self, prefix):
+        return self[:len(prefix)] == prefix
 
 
 def linepos(fdata, loc):
@@ -64,10 +113,18 @@ class PdfTokens(object):
     findparen = re.compile('(%s)[%s]*' % (p_literal_string_extend,
                                           whitespace), re.DOTALL).finditer
 
+    # The same patterns, for tokenizing BinaryData buffers in place
+    findtok_binary = re.compile(convert_store(
+        '(%s)[%s]*' % (pattern, whitespace)), re.DOTALL).finditer
+    findparen_binary = re.compile(convert_store(
+        '(%s)[%s]*' % (p_literal_string_extend, whitespace)),
+        re.DOTALL).finditer
+
     def _gettoks(self, startloc, intern=intern,
                  delimiters=delimiters, findtok=findtok,
                  findparen=findparen, PdfString=PdfString,
-                 PdfObject=PdfObject, BasePdfName=BasePdfName):
+                 PdfObject=PdfObject, BasePdfName=BasePdfName,
+                 convert_load=convert_load):
         ''' Given a source data string and a location inside it,
             gettoks generates tokens.  Each token is a tuple of the form:
              <starting file loc>, <ending file loc>, <token string>
@@ -81,13 +138,52 @@ class PdfTokens(object):
             We could use re.search instead of re.finditer, but that's slower.
         '''
         fdata = self.fdata
-        current = self.current = [(startloc, startloc)]
+        rawdata = fdata
+        binary = isinstance(fdata, BinaryData)
+        if binary:
+            rawdata = fdata.data
+            findtok = self.findtok_binary
+            findparen = self.findparen_binary
+        windowed = binary and isinstance(rawdata, BlockFile)
+        endpos = len(fdata)
+        # With a BlockFile, rawdata is a window of the file
+        # starting at base, and partial is set if the window
+        # does not reach the end of the data.
+        base = 0
+        partial = False
+        minsize = 0
+        current = self.current
         cache = {}
         get_cache = cache.get
         while 1:
-            for match in findtok(fdata, current[0][1]):
-                current[0] = tokspan = match.span()
+            if windowed:
+                base, rawdata = fdata.data.window(current[0][1], minsize)
+                endpos = min(len(rawdata), len(fdata) - base)
+                partial = base + endpos < len(fdata)
+                minsize = 0
+            for match in findtok(rawdata, current[0][1] - base, endpos):
+                tokspan = match.span()
+                if windowed:
+                    start, end = tokspan
+                    if partial and end == endpos:
+                        # The token might continue past the window
+                        current[0] = start + base, start + base
+                        minsize = 2 * endpos
+                        break
+                    tokspan = start + base, end + base
+                current[0] = tokspan
                 token = match.group(1)
+                if binary:
+                    # Names, numbers and keywords that have been
+                    # seen before don't need to be decoded again.
+                    newtok = get_cache(token)
+                    if newtok is not None:
+                        yield newtok
+                        if current[0] is not tokspan:
+                            break
+                        continue
+                    rawtoken = token
+                    token = convert_load(token)
                 firstch = token[0]
                 toktype = intern
                 if firstch not in delimiters:
@@ -99,6 +195,12 @@ class PdfTokens(object):
                     elif firstch == '<':
                         # << dict delim, or < hex string >
                         if token[1:2] != '<':
+                            if partial and token[-1:] != '>':
+                                # The hex string might continue
+                                # past the window
+                                current[0] = tokspan[0], tokspan[0]
+                                minsize = 2 * endpos
+                                break
                             toktype = PdfString
                     elif firstch == '(':
                         # Literal string
@@ -107,19 +209,25 @@ class PdfTokens(object):
                         # they are present, we exit the for loop
                         # and get back in with a new starting location.
                         ends = None  # For broken strings
-                        if fdata[match.end(1) - 1] != ')':
+                        if fdata[match.end(1) + base - 1] != ')':
                             nest = 2
                             m_start, loc = tokspan
-                            for match in findparen(fdata, loc):
-                                loc = match.end(1)
+                            for match in findparen(rawdata, loc - base,
+                                                   endpos):
+                                loc = match.end(1) + base
                                 ending = fdata[loc - 1] == ')'
                                 nest += 1 - ending * 2
                                 if not nest:
                                     break
                                 if ending and ends is None:
-                                    ends = loc, match.end(), nest
+                                    ends = loc, match.end() + base, nest
                             token = fdata[m_start:loc]
-                            current[0] = m_start, match.end()
+                            current[0] = m_start, match.end() + base
+                            if nest and partial:
+                                # Try again with a bigger window
+                                current[0] = m_start, m_start
+                                minsize = 2 * endpos
+                                break
                             if nest:
                                 # There is one possible recoverable error
                                 # seen in the wild -- some stupid generators
@@ -144,15 +252,24 @@ class PdfTokens(object):
                 newtok = get_cache(token)
                 if newtok is None:
                     newtok = cache[token] = toktype(token)
+                if binary and toktype is not PdfString:
+                    cache[rawtoken] = newtok
                 yield newtok
                 if current[0] is not tokspan:
                     break
             else:
+                if partial:
+                    # Nothing but whitespace left in the window
+                    current[0] = base + endpos, base + endpos
+                    continue
                 if self.strip_comments:
                     break
                 raise StopIteration
 
-    def __init__(self, fdata, startloc=0, strip_comments=True, verbose=True):
+    def __init__(self, fdata, startloc=0, strip_comments=True, verbose=True,
+                 bytes=bytes, str=str):
+        if isinstance(fdata, bytes) and not isinstance(fdata, str):
+            fdata = BinaryData(fdata)
         self.fdata = fdata
         self.strip_comments = strip_comments
         self.iterator = iterator = self._gettoks(startloc)
@@ -206,6 +323,9 @@ class PdfTokens(object):
         begin, end = self.current[0]
         if begin >= len(fdata):
             return '%s (filepos %s past EOF %s)' % (msg, begin, len(fdata))
+        if isinstance(fdata, BinaryData) and isinstance(fdata.data, BlockFile):
+            # Counting the lines would mean reading the whole file
+            return '%s (filepos %s)' % (msg, begin)
         line, col = linepos(fdata, begin)
         if end > begin:
             tok = fdata[begin:end].rstrip()
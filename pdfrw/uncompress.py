@@ -12,10 +12,18 @@ PNG predictor were originally transcribed from PyPDF2, which is
 probably an excellent source of additional filters.
 '''
 import array
-from .objects import PdfDict, PdfName, PdfArray
-from .errors import log
-from .py23_diffs import zlib, xrange, from_array, convert_load, convert_store
-import math
+import operator
+import collections
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .objects import PdfDict, PdfName, PdfArray, PdfObject
+from .errors import log, PdfParseError
+from .py23_diffs import (zlib, from_array, convert_load,
+                         convert_store, accumulate)
 
 def streamobjects(mylist, isinstance=isinstance, PdfDict=PdfDict):
     for obj in mylist:
@@ -26,10 +34,57 @@ def streamobjects(mylist, isinstance=isinstance, PdfDict=PdfDict):
 decompressobj = zlib if zlib is None else zlib.decompressobj
 
 
+def inflate(data, decompress=decompressobj):
+    ''' Decompress flate data.  Returns the data, along with an
+        error message (or None) for any data left over at the end.
+        Raises an exception if the data cannot be decompressed.
+    '''
+    dco = decompress()
+    data = dco.decompress(data)
+    assert not dco.unconsumed_tail
+    if dco.unused_data.strip():
+        return data, ('Unconsumed compression data: %s' %
+                      repr(dco.unused_data[:20]))
+    return data, None
+
+
+def inflate_all(mylist, workers):
+    ''' Yield (data, error, leftover) for each stream in mylist,
+        decompressing up to workers streams at a time.
+    '''
+    def worker(data):
+        try:
+            data, leftover = inflate(data)
+        except Exception as s:
+            return None, str(s), None
+        return data, None, leftover
+
+    sources = (convert_store(obj.stream) for obj in mylist)
+    if workers > 1 and len(mylist) > 1:
+        # Imported here, because it is slow to import
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(min(workers, len(mylist)))
+        try:
+            for result in pool.imap(worker, sources):
+                yield result
+        finally:
+            pool.terminate()
+    else:
+        for data in sources:
+            yield worker(data)
+
+
 def uncompress(mylist, leave_raw=False, warnings=set(),
-               flate=PdfName.FlateDecode, decompress=decompressobj,
-               isinstance=isinstance, list=list, len=len):
+               flate=PdfName.FlateDecode,
+               isinstance=isinstance, list=list, len=len, bytes=bytes,
+               vars=vars, zip=zip, workers=1):
+    ''' Decompress the streams of the objects in mylist.  The
+        zlib decompression is done in a pool of worker threads
+        if workers > 1; predictors are always applied afterwards,
+        one stream at a time.
+    '''
     ok = True
+    todo = []
     for obj in streamobjects(mylist):
         ftype = obj.Filter
         if ftype is None:
@@ -46,41 +101,334 @@ def uncompress(mylist, leave_raw=False, warnings=set(),
                 log.warning(msg)
             ok = False
         else:
-            dco = decompress()
-            try:
-                data = dco.decompress(convert_store(obj.stream))
-            except Exception as s:
-                error = str(s)
-            else:
-                error = None
-                if isinstance(parms, PdfArray):
-                    oldparms = parms
-                    parms = PdfDict()
-                    for x in oldparms:
-                        parms.update(x)
-                if parms:
-                    predictor = int(parms.Predictor or 1)
-                    columns = int(parms.Columns or 1)
-                    colors = int(parms.Colors or 1)
-                    bpc = int(parms.BitsPerComponent or 8)
-                    if 10 <= predictor <= 15:
-                        data, error = flate_png(data, predictor, columns, colors, bpc)
-                    elif predictor != 1:
-                        error = ('Unsupported flatedecode predictor %s' %
-                                 repr(predictor))
-            if error is None:
-                assert not dco.unconsumed_tail
-                if dco.unused_data.strip():
-                    error = ('Unconsumed compression data: %s' %
-                             repr(dco.unused_data[:20]))
-            if error is None:
-                obj.Filter = None
-                obj.stream = data if leave_raw else convert_load(data)
-            else:
-                log.error('%s %s' % (error, repr(obj.indirect)))
-                ok = False
+            todo.append(obj)
+
+    for obj, (data, error, leftover) in zip(todo,
+                                            inflate_all(todo, workers)):
+        if error is None:
+            parms = obj.DecodeParms or obj.DP
+            if isinstance(parms, PdfArray):
+                oldparms = parms
+                parms = PdfDict()
+                for x in oldparms:
+                    parms.update(x)
+            if parms:
+                predictor = int(parms.Predictor or 1)
+                columns = int(parms.Columns or 1)
+                colors = int(parms.Colors or 1)
+                bpc = int(parms.BitsPerComponent or 8)
+                if 10 <= predictor <= 15:
+                    data, error = flate_png(data, predictor, columns, colors, bpc)
+                elif predictor != 1:
+                    error = ('Unsupported flatedecode predictor %s' %
+                             repr(predictor))
+            error = error or leftover
+        if error is None:
+            # Decompression alone doesn't count as a change
+            onchange = vars(obj).pop('_onchange', None)
+            obj.Filter = None
+            raw = leave_raw or isinstance(obj.stream, bytes)
+            obj.stream = data if raw else convert_load(data)
+            if onchange is not None:
+                obj._onchange = onchange
+        else:
+            log.error('%s %s' % (error, repr(obj.indirect)))
+            ok = False
     return ok
 
+
+class _LazyDecode(object):
+    ''' Installed as the _streamloader (and _rawstream) of a
+        PdfDict whose stream is to be decompressed on first use.
+        The decompressed stream is kept in the DecodeCache, so
+        the loader is called every time the stream is used.
+    '''
+
+    keep_loader = True
+
+    def __init__(self, cache, obj, raw):
+        self.cache = cache
+        self.obj = obj
+        self.raw = raw
+        self.Filter = obj.Filter
+        self.Length = obj.Length
+
+    def rawdata(self, callable=callable):
+        raw = self.raw
+        return raw() if callable(raw) else raw
+
+    def __call__(self, vars=vars):
+        data = self.cache.get(self)
+        if data is not None:
+            return data
+        obj = self.obj
+        tmp = PdfDict(Filter=self.Filter,
+                      DecodeParms=obj.DecodeParms or obj.DP)
+        tmp.indirect = obj.indirect
+        tmp._stream = self.rawdata()
+        if not uncompress([tmp]):
+            # Give up and leave the stream compressed
+            objvars = vars(obj)
+            objvars.pop('_rawstream', None)
+            objvars.pop('_streamloader', None)
+            data = objvars['stream'] = tmp.stream
+            return data
+        data = tmp.stream
+        onchange = vars(obj).pop('_onchange', None)
+        obj.Filter = None
+        obj.Length = PdfObject(len(data))
+        if onchange is not None:
+            obj._onchange = onchange
+        self.cache.add(self, data)
+        return data
+
+    def copy_to(self, obj, vars=vars):
+        ''' Give obj, a new copy of the dictionary, the stream
+            as read from the file, to be decompressed when obj's
+            stream is first used.
+        '''
+        obj.Filter = self.Filter
+        obj.Length = self.Length
+        objvars = vars(obj)
+        objvars.pop('stream', None)
+        objvars['_streamloader'] = objvars['_rawstream'] = _LazyDecode(
+            self.cache, obj, self.raw)
+
+    def original(self):
+        ''' Return a copy of the dictionary with its
+            stream still compressed, as read from the file.
+        '''
+        obj = self.obj
+        result = PdfDict()
+        dict.update(result, obj)
+        result.indirect = obj.indirect
+        result.Filter = self.Filter
+        result.Length = self.Length
+        result._stream = self.rawdata()
+        return result
+
+
+class DecodeCache(object):
+    ''' Decompresses streams on demand instead of all at once.
+
+        defer(obj) arranges for the stream of obj to be decompressed
+        the first time it is accessed.  At most maxsize decompressed
+        streams are retained; when that is exceeded, the least
+        recently used one is dropped, and will be decompressed again
+        if it is used again.  (A stream that is assigned to is no
+        longer in the cache's keeping.)
+
+        A stream that is never modified keeps its original
+        compressed data, which PdfWriter will write out as-is.
+    '''
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.decoded = collections.OrderedDict()
+
+    def defer(self, obj, flate=PdfName.FlateDecode, vars=vars):
+        ftype = obj.Filter
+        if isinstance(ftype, list) and len(ftype) == 1:
+            ftype = ftype[0]
+        if ftype != flate:
+            return
+        objvars = vars(obj)
+        raw = objvars.pop('_streamloader', None)
+        if raw is None:
+            raw = objvars.pop('stream')
+        objvars['_streamloader'] = objvars['_rawstream'] = _LazyDecode(
+            self, obj, raw)
+
+    def get(self, decoder):
+        ''' Return the decompressed stream for decoder,
+            or None if it is not in the cache.
+        '''
+        decoded = self.decoded
+        data = decoded.pop(decoder, None)
+        if data is not None:
+            # Move it to the most recently used end
+            decoded[decoder] = data
+        return data
+
+    def add(self, decoder, data):
+        decoded = self.decoded
+        decoded[decoder] = data
+        while len(decoded) > self.maxsize:
+            decoded.popitem(last=False)
+
+
+def png_rows(rows, columnbytes, pixel_size, array=array.array):
+    ''' Reconstruct PNG-predicted rows one at a time.  rows
+        is an iterable of filtered rows, each starting with its
+        filter type byte.  Yields each reconstructed row (without
+        the filter type byte) as an array.  Only the previous row
+        is retained, so rows can be decoded as they arrive.
+    '''
+    prior = array('B', [0]) * columnbytes
+    for row in rows:
+        row = array('B', row)
+        if len(row) != columnbytes + 1:
+            raise PdfParseError('PNG row has %d bytes instead of %d' %
+                                (len(row), columnbytes + 1))
+        current = recon_row(row[0], row[1:], prior, pixel_size)
+        if current is None:
+            raise PdfParseError('Unsupported PNG filter %d' % row[0])
+        yield current
+        prior = current
+
+
+def recon_row(filter_type, current, prior, pixel_size, array=array.array,
+              range=range, map=map, add=operator.add, byte=(255).__and__):
+    ''' Reconstruct a single row, given as an array without its
+        filter type byte.  Returns the row, or None if the filter
+        type is not supported.
+    '''
+    if filter_type == 0:  # None filter
+        return current
+
+    if filter_type == 1:  # Sub filter
+        # Recon(x) = Filt(x) + Recon(a)
+        for i in range(pixel_size):
+            current[i::pixel_size] = array(
+                'B', map(byte, accumulate(current[i::pixel_size])))
+        return current
+
+    if filter_type == 2:  # Up filter
+        # Recon(x) = Filt(x) + Recon(b)
+        return array('B', map(byte, map(add, current, prior)))
+
+    if filter_type == 3:  # Average filter
+        return array('B', avg_row(current.tolist(), prior.tolist(),
+                                  pixel_size))
+
+    if filter_type == 4:  # Paeth filter
+        return array('B', paeth_row(current.tolist(), prior.tolist(),
+                                    pixel_size))
+
+
+def png_rows_python(data, out, rowlen, pixel_size, array=array.array,
+                    range=range, map=map, byte=(255).__and__):
+    ''' Reconstruct the PNG-predicted rows in the array data into
+        the preallocated array out, which has room for every row
+        without its filter type byte.  Returns an error message,
+        or None.
+    '''
+    columnbytes = rowlen - 1
+    nrows = len(data) // rowlen
+    prior = array('B', [0]) * columnbytes
+    row = 0
+    while row < nrows:
+        start = row * rowlen + 1
+        filter_type = data[start - 1]
+        if filter_type == 2:
+            last = row + 1
+            while last < nrows and data[last * rowlen] == 2:
+                last += 1
+            if last - row > columnbytes:
+                # A long run of Up rows (typical for xref streams)
+                # is faster to do a column at a time.
+                stop = last * rowlen
+                outstart = row * columnbytes
+                outstop = last * columnbytes
+                for i in range(columnbytes):
+                    column = data[start + i:stop:rowlen]
+                    column[0] = byte(column[0] + prior[i])
+                    out[outstart + i:outstop:columnbytes] = array(
+                        'B', map(byte, accumulate(column)))
+                prior = out[outstop - columnbytes:outstop]
+                row = last
+                continue
+        current = recon_row(filter_type, data[start:start + columnbytes],
+                            prior, pixel_size)
+        if current is None:
+            return 'Unsupported PNG filter %d' % filter_type
+        out[row * columnbytes:(row + 1) * columnbytes] = current
+        prior = current
+        row += 1
+
+
+def png_rows_numpy(data, out, rowlen, pixel_size, range=range):
+    ''' Same as png_rows_python, but uses NumPy for the None, Sub
+        and Up filters, which can be done a whole row at a time.
+    '''
+    uint8 = numpy.uint8
+    cumsum = numpy.cumsum
+    rows = numpy.frombuffer(data, dtype=uint8).reshape(-1, rowlen)
+    filter_types = rows[:, 0]
+    if len(filter_types) and filter_types.max() > 4:
+        bad = filter_types[filter_types > 4][0]
+        return 'Unsupported PNG filter %d' % bad
+    nrows = len(rows)
+    result = numpy.frombuffer(out, dtype=uint8).reshape(nrows, rowlen - 1)
+    # Strip all the filter type bytes at once, then work in place
+    result[:] = rows[:, 1:]
+    prior = numpy.zeros(rowlen - 1, dtype=uint8)
+    row = 0
+    while row < nrows:
+        filter_type = filter_types[row]
+        current = result[row]
+
+        if filter_type == 1:  # Sub filter
+            pixels = current.reshape(-1, pixel_size)
+            cumsum(pixels, axis=0, dtype=uint8, out=pixels)
+
+        elif filter_type == 2:  # Up filter
+            # Do all the consecutive rows with the Up filter at once
+            last = row + 1
+            while last < nrows and filter_types[last] == 2:
+                last += 1
+            block = result[row:last]
+            block[0] += prior
+            cumsum(block, axis=0, dtype=uint8, out=block)
+            row = last - 1
+            current = result[row]
+
+        elif filter_type == 3:  # Average filter
+            current[:] = avg_row(current.tolist(), prior.tolist(),
+                                 pixel_size)
+
+        elif filter_type == 4:  # Paeth filter
+            current[:] = paeth_row(current.tolist(), prior.tolist(),
+                                   pixel_size)
+
+        prior = current
+        row += 1
+
+
+def avg_row(row, up, pixel_size, range=range):
+    ''' Recon(x) = Filt(x) + floor((Recon(a) + Recon(b)) / 2)
+    '''
+    for i in range(pixel_size):
+        row[i] = (row[i] + (up[i] >> 1)) & 255
+    for i in range(pixel_size, len(row)):
+        row[i] = (row[i] + ((row[i - pixel_size] + up[i]) >> 1)) & 255
+    return row
+
+
+def paeth_row(row, up, pixel_size, range=range, abs=abs):
+    ''' Recon(x) = Filt(x) + PaethPredictor(Recon(a), Recon(b), Recon(c))
+    '''
+    for i in range(pixel_size):
+        # a and c are both 0, so the predictor is always b
+        row[i] = (row[i] + up[i]) & 255
+    for i in range(pixel_size, len(row)):
+        a = row[i - pixel_size]
+        b = up[i]
+        c = up[i - pixel_size]
+        pa = b - c
+        pb = a - c
+        pc = abs(pa + pb)
+        pa = abs(pa)
+        pb = abs(pb)
+        if pa <= pb and pa <= pc:
+            row[i] = (row[i] + a) & 255
+        elif pb <= pc:
+            row[i] = (row[i] + b) & 255
+        else:
+            row[i] = (row[i] + c) & 255
+    return row
+
+
 def flate_png_impl(data, predictor=1, columns=1, colors=1, bpc=8):
 
     # http://www.libpng.org/pub/png/spec/1.2/PNG-Filters.html
@@ -91,49 +439,6 @@ def flate_png_impl(data, predictor=1, columns=1, colors=1, bpc=8):
     # b: the byte corresponding to x in the previous scanline;
     # c: the byte corresponding to b in the pixel immediately before the pixel containing b (or the byte immediately before b, when the bit depth is less than 8).
 
-    def subfilter(data, prior_row_data, start, length, pixel_size):
-        # filter type 1: Sub
-        # Recon(x) = Filt(x) + Recon(a)
-        for i in xrange(pixel_size, length):
-            left = data[start + i - pixel_size]
-            data[start + i] = (data[start + i] + left) % 256
-
-    def upfilter(data, prior_row_data, start, length, pixel_size):
-        # filter type 2: Up
-        # Recon(x) = Filt(x) + Recon(b)
-        for i in xrange(length):
-            up = prior_row_data[i]
-            data[start + i] = (data[start + i] + up) % 256
-
-    def avgfilter(data, prior_row_data, start, length, pixel_size):
-        # filter type 3: Avg
-        # Recon(x) = Filt(x) + floor((Recon(a) + Recon(b)) / 2)
-        for i in xrange(length):
-            left = data[start + i - pixel_size] if i >= pixel_size else 0
-            up = prior_row_data[i]
-            floor = math.floor((left + up) / 2)
-            data[start + i] = (data[start + i] + int(floor)) % 256
-
-    def paethfilter(data, prior_row_data, start, length, pixel_size):
-        # filter type 4: Paeth
-        # Recon(x) = Filt(x) + PaethPredictor(Recon(a), Recon(b), Recon(c))
-        def paeth_predictor(a, b, c):
-            p = a + b - c
-            pa = abs(p - a)
-            pb = abs(p - b)
-            pc = abs(p - c)
-            if pa <= pb and pa <= pc:
-                return a
-            elif pb <= pc:
-                return b
-            else:
-                return c
-        for i in xrange(length):
-            left = data[start + i - pixel_size] if i >= pixel_size else 0
-            up = prior_row_data[i]
-            up_left = prior_row_data[i - pixel_size] if i >= pixel_size else 0
-            data[start + i] = (data[start + i] + paeth_predictor(left, up, up_left)) % 256
-
     columnbytes = ((columns * colors * bpc) + 7) // 8
     pixel_size = (colors * bpc + 7) // 8
     data = array.array('B', data)
@@ -143,36 +448,16 @@ def flate_png_impl(data, predictor=1, columns=1, colors=1, bpc=8):
         data.extend([0] * padding)
     assert len(data) % rowlen == 0
 
-    rows = xrange(0, len(data), rowlen)
-    prior_row_data = [ 0 for i in xrange(columnbytes) ]
-    for row_index in rows:
-
-        filter_type = data[row_index]
-
-        if filter_type == 0: # None filter
-            pass
-
-        elif filter_type == 1: # Sub filter
-            subfilter(data, prior_row_data, row_index + 1, columnbytes, pixel_size)
-
-        elif filter_type == 2: # Up filter
-            upfilter(data, prior_row_data, row_index + 1, columnbytes, pixel_size)
-
-        elif filter_type == 3: # Average filter
-            avgfilter(data, prior_row_data, row_index + 1, columnbytes, pixel_size)
-
-        elif filter_type == 4: # Paeth filter
-            paethfilter(data, prior_row_data, row_index + 1, columnbytes, pixel_size)
-
-        else:
-            return None, 'Unsupported PNG filter %d' % filter_type
-
-        prior_row_data = data[row_index + 1 : row_index + 1 + columnbytes] # without filter_type
-
-    for row_index in reversed(rows):
-        data.pop(row_index)
-
-    return data, None
+    # The reconstructed rows go straight into the output,
+    # without their filter type bytes.
+    out = array.array('B', [0]) * (len(data) // rowlen * columnbytes)
+    if numpy is not None and columnbytes % pixel_size == 0:
+        error = png_rows_numpy(data, out, rowlen, pixel_size)
+    else:
+        error = png_rows_python(data, out, rowlen, pixel_size)
+    if error is not None:
+        return None, error
+    return out, None
 
 def flate_png(data, predictor=1, columns=1, colors=1, bpc=8):
     ''' PNG prediction is used to make certain kinds of data
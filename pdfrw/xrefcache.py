@@ -0,0 +1,189 @@
+# A part of pdfrw (https://github.com/pmaupin/pdfrw)
+# Copyright (C) 2006-2015 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Support for PdfReader(index_cache=dirname).
+
+Once PdfReader has parsed all of the cross-reference sections
+of a file, save() stores the results in a small JSON sidecar
+file in the cache directory.  The next time the same file is
+opened, load() returns that information, and PdfReader skips
+the cross-reference parsing entirely.
+
+Sidecar files are named after the size and modification time
+of the file, and the SHA-1 hash of its start, its end (which holds
+the trailer), and the cross-reference section that startxref points
+to.  Any edit that moves an object changes at least one of those
+samples, and any other edit changes the modification time, so a
+changed file does not pick up a stale index.  Hashing a bounded
+sample keeps the cost of a lookup the same for large files.  When
+there is no file to get a modification time from (e.g. the data
+was passed in as fdata), all of the data is hashed instead.
+
+Within a process, the key for a file name is also remembered along
+with the file's size and modification time, so an unchanged file
+is not read again to compute it.
+'''
+
+import os
+import json
+import hashlib
+import tempfile
+
+from .objects import PdfDict, PdfArray, PdfIndirect
+from .errors import log
+from .xreftable import OffsetTable, CompressedTable
+from .py23_diffs import iteritems, convert_store
+
+# Bump this if the sidecar file contents change
+FORMAT = 2
+
+# Number of bytes hashed from each part of the file
+SAMPLE = 64 * 1024
+
+# Keys already computed, by (file name, inode, size, mtime)
+known_keys = {}
+MAX_KNOWN = 1000
+
+
+def filestat(fname):
+    ''' Return an identifier for the current version of a
+        file name or open file, or None if it cannot be found.
+        (The name in the identifier is None for an open file.)
+    '''
+    try:
+        if hasattr(fname, 'read'):
+            st = os.fstat(fname.fileno())
+            fname = None
+        else:
+            st = os.stat(fname)
+            fname = os.path.abspath(fname)
+    except (AttributeError, EnvironmentError, TypeError, ValueError):
+        return None
+    mtime = getattr(st, 'st_mtime_ns', st.st_mtime)
+    return fname, st.st_ino, st.st_size, mtime
+
+
+def cachekey(fdata, xrefloc, fname=None, convert=convert_store):
+    ''' Return the cache key for the file data (a string or
+        BinaryData), whose main cross-reference section is at
+        xrefloc, and which was read from fname (a file name or
+        open file), if that is given.  A key that was already
+        computed for a file name is reused while the file's
+        size and modification time are unchanged.
+    '''
+    stat = fname is not None and filestat(fname) or None
+    if stat is not None and stat[0] is None:
+        # An open file may not be read from its start, so
+        # only its modification time is any use.
+        mtime = stat[3]
+        stat = None
+    else:
+        mtime = stat and stat[3]
+    key = known_keys.get(stat)
+    if key is not None:
+        return key
+    size = len(fdata)
+    sha = hashlib.sha1()
+    if mtime is None:
+        starts = range(0, size, SAMPLE)
+    else:
+        starts = 0, max(size - SAMPLE, 0), xrefloc
+    for start in starts:
+        sha.update(convert(fdata[start:start + SAMPLE]))
+    key = '%s-%d' % (sha.hexdigest(), size)
+    if mtime is not None:
+        key = '%s-%s' % (key, mtime)
+    if stat is not None:
+        if len(known_keys) >= MAX_KNOWN:
+            known_keys.clear()
+        known_keys[stat] = key
+    return key
+
+
+def cachefile(dirname, key):
+    return os.path.join(dirname, '%s.json' % key)
+
+
+def format_trailer(obj, top=True, isinstance=isinstance,
+                   PdfIndirect=PdfIndirect, PdfDict=PdfDict,
+                   PdfArray=PdfArray):
+    ''' Format the trailer dictionary back into PDF syntax.
+        Indirect objects (whether or not they have been read
+        in yet) are formatted as references.
+    '''
+    if isinstance(obj, PdfIndirect):
+        return '%s %s R' % obj
+    indirect = getattr(obj, 'indirect', False)
+    if isinstance(indirect, tuple) and not top:
+        return '%s %s R' % indirect
+    if isinstance(obj, PdfDict):
+        return '<<%s>>' % ' '.join(
+            '%s %s' % (getattr(key, 'encoded', None) or key,
+                       format_trailer(value, False))
+            for key, value in iteritems(obj))
+    if isinstance(obj, PdfArray):
+        return '[%s]' % ' '.join(format_trailer(value, False)
+                                 for value in list.__iter__(obj))
+    return str(getattr(obj, 'encoded', None) or obj)
+
+
+def save(dirname, key, offsets, compressed, trailer, is_stream):
+    ''' Save the cross-reference information for a file.
+        Failures are logged, but are not fatal.
+    '''
+    flat_offsets = []
+    for (objnum, gennum), offset in offsets.iteritems():
+        flat_offsets.extend((objnum, gennum, int(offset)))
+    flat_compressed = []
+    for (objnum, gennum), (streamnum, index) in compressed.iteritems():
+        flat_compressed.extend((objnum, gennum, streamnum, index))
+    info = dict(format=FORMAT, offsets=flat_offsets,
+                compressed=flat_compressed,
+                trailer=format_trailer(trailer), is_stream=is_stream)
+    try:
+        fd, tmpname = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+    except EnvironmentError as s:
+        log.warning('Could not save PDF index cache: %s' % s)
+        return
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(info, f, separators=(',', ':'))
+        # Atomic on POSIX, so concurrent readers never see a partial file
+        os.rename(tmpname, cachefile(dirname, key))
+    except (EnvironmentError, ValueError) as s:
+        log.warning('Could not save PDF index cache: %s' % s)
+        try:
+            os.remove(tmpname)
+        except EnvironmentError:
+            pass
+
+
+def load(dirname, key):
+    ''' Return (offsets, compressed, trailer, is_stream),
+        where trailer is still in (binary) PDF syntax, or None
+        if there is no usable cached information for the file.
+    '''
+    fname = cachefile(dirname, key)
+    if not os.path.exists(fname):
+        return None
+    try:
+        with open(fname) as f:
+            info = json.load(f)
+        if info['format'] != FORMAT:
+            return None
+        flat_offsets = info['offsets']
+        offsets = OffsetTable(((flat_offsets[i], flat_offsets[i + 1]),
+                               flat_offsets[i + 2])
+                              for i in range(0, len(flat_offsets), 3))
+        flat_compressed = info['compressed']
+        compressed = CompressedTable(
+            ((flat_compressed[i], flat_compressed[i + 1]),
+             (flat_compressed[i + 2], flat_compressed[i + 3]))
+            for i in range(0, len(flat_compressed), 4))
+        trailer = info['trailer'].encode('latin-1')
+        return offsets, compressed, trailer, info['is_stream']
+    except (EnvironmentError, ValueError, KeyError, TypeError) as s:
+        log.warning('Could not load PDF index cache: %s' % s)
+        return None
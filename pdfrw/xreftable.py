@@ -0,0 +1,179 @@
+# A part of pdfrw (https://github.com/pmaupin/pdfrw)
+# Copyright (C) 2006-2015 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Compact cross-reference tables for PdfReader.
+
+A dict keyed by (objnum, gennum) tuples costs well over a hundred
+bytes per object, which adds up for files with millions of objects.
+These tables behave like such a dict, but keep the entries for
+generation 0 (nearly all of them) in arrays indexed by object
+number, at a few bytes per object.  Any other entries go in a
+small side dictionary.
+
+OffsetTable maps keys to the file offsets of objects, and
+CompressedTable maps keys to the (object stream number, index)
+locations of objects stored inside object streams.
+'''
+
+import array
+
+from .py23_diffs import int64_typecode
+
+# An object number this far past the number of entries goes in
+# the side dictionary, so that a corrupt cross-reference section
+# cannot make the arrays huge.
+SPARSE_LIMIT = 4096
+
+
+class XrefTable(object):
+    ''' Base class for the tables.  Subclasses define the array
+        typecodes, the array value that marks a missing entry,
+        and how to convert between values and array columns.
+    '''
+    typecodes = ()
+    missing = 0
+
+    def __init__(self, items=()):
+        self.columns = [array.array(code) for code in self.typecodes]
+        self.extra = {}
+        self.count = 0
+        for key, value in items:
+            self[key] = value
+
+    def slot(self, key, len=len):
+        ''' Return the array index for key, or None if the key
+            belongs in the side dictionary.
+        '''
+        objnum, gennum = key
+        if gennum or objnum < 0:
+            return None
+        size = len(self.columns[0])
+        if objnum >= size:
+            if objnum > self.count * 4 + SPARSE_LIMIT:
+                return None
+            grow = max(objnum + 1, size * 2) - size
+            for column in self.columns:
+                column.extend(array.array(column.typecode,
+                                          [self.missing]) * grow)
+        return objnum
+
+    def get(self, key, default=None, len=len):
+        objnum, gennum = key
+        if not gennum and 0 <= objnum < len(self.columns[0]):
+            value = self.load(objnum)
+            if value is not None:
+                return value
+        return self.extra.get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __setitem__(self, key, value):
+        if key in self:
+            self.pop(key)
+        index = self.slot(key)
+        if index is None:
+            self.extra[key] = value
+        else:
+            self.store(index, value)
+            self.count += 1
+
+    def setdefault(self, key, value, len=len):
+        objnum, gennum = key
+        if not gennum and 0 <= objnum < len(self.columns[0]):
+            # Fast path for the cross-reference parsers
+            result = self.load(objnum)
+            if result is None:
+                self.store(objnum, value)
+                self.count += 1
+                result = value
+            return result
+        result = self.get(key)
+        if result is None:
+            self[key] = result = value
+        return result
+
+    def pop(self, key, default=None, len=len):
+        objnum, gennum = key
+        if not gennum and 0 <= objnum < len(self.columns[0]):
+            value = self.load(objnum)
+            if value is not None:
+                self.store(objnum, None)
+                self.count -= 1
+                return value
+        return self.extra.pop(key, default)
+
+    def update(self, other):
+        for key, value in other.items():
+            self[key] = value
+
+    def iteritems(self, enumerate=enumerate):
+        missing = self.missing
+        load = self.load
+        for objnum, value in enumerate(self.columns[0]):
+            if value != missing:
+                yield (objnum, 0), load(objnum)
+        for item in list(self.extra.items()):
+            yield item
+
+    def items(self):
+        return list(self.iteritems())
+
+    def keys(self):
+        return [key for key, value in self.iteritems()]
+
+    def values(self):
+        return [value for key, value in self.iteritems()]
+
+    def __iter__(self):
+        for key, value in self.iteritems():
+            yield key
+
+    def __len__(self):
+        return self.count + len(self.extra)
+
+    def __eq__(self, other):
+        return dict(self.iteritems()) == dict(other.items())
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class OffsetTable(XrefTable):
+    ''' Maps (objnum, gennum) to the offset of the object in the file.
+        Offsets are never 0, so 0 marks a missing entry.
+    '''
+    typecodes = (int64_typecode,)
+    missing = 0
+
+    def load(self, objnum):
+        return self.columns[0][objnum] or None
+
+    def store(self, objnum, value):
+        self.columns[0][objnum] = value or 0
+
+
+class CompressedTable(XrefTable):
+    ''' Maps (objnum, gennum) to the (object stream number, index)
+        location of an object inside an object stream.
+    '''
+    typecodes = (int64_typecode, int64_typecode)
+    missing = -1
+
+    def load(self, objnum):
+        num = self.columns[0][objnum]
+        if num != -1:
+            return num, self.columns[1][objnum]
+
+    def store(self, objnum, value):
+        num, index = value if value is not None else (-1, -1)
+        self.columns[0][objnum] = num
+        self.columns[1][objnum] = index
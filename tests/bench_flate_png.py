@@ -0,0 +1,58 @@
+#! /usr/bin/env python
+
+# A part of pdfrw (https://github.com/pmaupin/pdfrw)
+# MIT license -- See LICENSE.txt for details
+
+'''
+Run from the directory above like so:
+
+   python -m tests.bench_flate_png
+
+Runs the pure-Python and (if available) NumPy PNG predictor
+engines over some larger inputs, checks that they agree, and
+reports their throughput.
+'''
+
+import time
+
+from pdfrw import uncompress
+from pdfrw.uncompress import flate_png_impl
+
+from .test_flate_png import create_random_rows
+
+
+def run_engines(name, nrows, columns, colors, filter_types):
+    data = create_random_rows(nrows, columns * colors, filter_types)
+    engines = [('python', None)]
+    if uncompress.numpy is not None:
+        engines.append(('numpy', uncompress.numpy))
+    results = []
+    saved = uncompress.numpy
+    try:
+        for engine, numpy in engines:
+            uncompress.numpy = numpy
+            start = time.time()
+            result, error = flate_png_impl(data, 12, columns, colors, 8)
+            elapsed = max(time.time() - start, 1e-6)
+            assert error is None
+            results.append(result)
+            print('%-6s %-6s %.1f MB/s' % (
+                name, engine, len(data) / elapsed / 1e6))
+    finally:
+        uncompress.numpy = saved
+    for result in results[1:]:
+        assert result == results[0]
+    assert len(results[0]) == nrows * columns * colors
+
+
+def main():
+    # Xref streams are typically all Up rows of a few bytes
+    run_engines('xref', 20000, 5, 1, [2])
+    run_engines('image', 300, 600, 3, [0, 1, 2, 3, 4])
+    run_engines('sub_up', 300, 600, 3, [1, 2])
+    # Row stripping used to be quadratic in the number of rows
+    run_engines('tall', 10000, 100, 1, [0, 1, 2, 3, 4])
+
+
+if __name__ == '__main__':
+    main()
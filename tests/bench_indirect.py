@@ -0,0 +1,59 @@
+#! /usr/bin/env python
+
+# A part of pdfrw (https://github.com/pmaupin/pdfrw)
+# MIT license -- See LICENSE.txt for details
+
+'''
+Run from the directory above like so:
+
+   python -m tests.bench_indirect [numrefs]
+
+Builds a PDF whose single page has an array of numrefs
+references to small indirect objects (500,000 by default),
+then reports how much memory PdfReader uses for the file,
+both before and after the references are resolved.
+'''
+
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+from pdfrw import PdfReader, PdfWriter, PdfDict, PdfArray, PdfName
+from pdfrw import IndirectPdfDict
+
+
+def make_pdf(numrefs):
+    page = PdfDict(
+        Type=PdfName.Page,
+        MediaBox=PdfArray([0, 0, 612, 792]),
+        Annots=PdfArray(IndirectPdfDict(Index=i) for i in range(numrefs)),
+    )
+    f = BytesIO()
+    PdfWriter(f).addpage(page).write()
+    return f.getvalue()
+
+
+def main(numrefs=500000):
+    fdata = make_pdf(numrefs)
+    print('%d references, %d bytes' % (numrefs, len(fdata)))
+
+    tracemalloc.start()
+    start = time.time()
+    reader = PdfReader(fdata=fdata)
+    elapsed = time.time() - start
+    unresolved = tracemalloc.get_traced_memory()[0]
+    print('open      %.2fs, %.1fMB, %d bytes/reference' %
+          (elapsed, unresolved / 1e6, unresolved // numrefs))
+
+    start = time.time()
+    annots = reader.pages[0].Annots
+    assert len(list(annots)) == numrefs
+    elapsed = time.time() - start
+    resolved = tracemalloc.get_traced_memory()[0]
+    print('resolved  %.2fs, %.1fMB, %d bytes/reference' %
+          (elapsed, resolved / 1e6, resolved // numrefs))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,47 @@
+#! /usr/bin/env python
+
+# A part of pdfrw (https://github.com/pmaupin/pdfrw)
+# MIT license -- See LICENSE.txt for details
+
+'''
+Run from the directory above like so:
+
+   python -m tests.bench_read_all [numobjs]
+
+Builds a PDF with a chain of numobjs indirect objects (32,000 by
+default), each found only through the /Next entry of the one before
+it, and reports how long PdfReader.read_all() takes to load them.
+'''
+
+import sys
+import time
+from io import BytesIO
+
+from pdfrw import PdfReader, PdfWriter, PdfDict, PdfName
+from pdfrw import IndirectPdfDict
+
+
+def make_pdf(numobjs):
+    first = item = IndirectPdfDict(Index=0)
+    for i in range(1, numobjs):
+        item.Next = item = IndirectPdfDict(Index=i)
+    writer = PdfWriter()
+    writer.addpage(PdfDict(Type=PdfName.Page, Chain=first))
+    f = BytesIO()
+    writer.write(f)
+    return f.getvalue()
+
+
+def main(numobjs=32000):
+    fdata = make_pdf(numobjs)
+    print('%d objects, %d bytes' % (numobjs, len(fdata)))
+
+    start = time.time()
+    reader = PdfReader(fdata=fdata)
+    reader.read_all()
+    elapsed = time.time() - start
+    print('read_all  %.2fs, %d objects/s' % (elapsed, numobjs / elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,87 @@
+#! /usr/bin/env python
+
+# A part of pdfrw (https://github.com/pmaupin/pdfrw)
+# MIT license -- See LICENSE.txt for details
+
+'''
+Run from the directory above like so:
+
+   python -m tests.bench_streams [numpages]
+
+Builds a stream-heavy PDF in memory, then decompresses,
+recompresses and writes it back out, once with the default
+string-based reader and once with PdfReader(binary=True).
+
+For each mode, reports the best total time of several runs, and
+the time that cProfile attributes to zlib, to Latin-1 encoding and
+decoding, and to everything else.
+
+Most of the time goes to zlib either way.  Latin-1 encoding and
+decoding is cheap (a few milliseconds for 300 pages), so what
+binary=True mainly saves is the decoded copy of the whole file,
+rather than time.
+'''
+
+import sys
+import time
+import cProfile
+import pstats
+from io import BytesIO
+
+from pdfrw import PdfReader, PdfWriter, PdfDict, PdfArray, PdfName
+
+
+def make_pdf(numpages):
+    writer = PdfWriter(compress=True)
+    for i in range(numpages):
+        lines = ['%d %d m %d %d l S' % (i, j, j, i) for j in range(2000)]
+        writer.addpage(PdfDict(
+            Type=PdfName.Page,
+            MediaBox=PdfArray([0, 0, 612, 792]),
+            Contents=PdfDict(stream='\n'.join(lines)),
+        ))
+    f = BytesIO()
+    writer.write(f)
+    return f.getvalue()
+
+
+def roundtrip(fdata, **kwargs):
+    reader = PdfReader(fdata=fdata, decompress=True, **kwargs)
+    PdfWriter(trailer=reader, compress=True).write(BytesIO())
+
+
+def profile_times(stats):
+    ''' Return the time spent in zlib, and in encoding and decoding.
+    '''
+    zlib_time = codec_time = 0.0
+    for (fname, line, func), info in stats.stats.items():
+        if func in ("<method 'encode' of 'str' objects>",
+                    "<method 'decode' of 'bytes' objects>"):
+            codec_time += info[2]
+        elif func in ('<built-in method zlib.compress>',
+                      "<method 'decompress' of 'zlib.Decompress' objects>"):
+            zlib_time += info[2]
+    return zlib_time, codec_time
+
+
+def main(numpages=200):
+    fdata = make_pdf(numpages)
+    print('%d pages, %d bytes' % (numpages, len(fdata)))
+    for name, kwargs in (('str', {}), ('binary', dict(binary=True))):
+        elapsed = []
+        for i in range(5):
+            start = time.time()
+            roundtrip(fdata, **kwargs)
+            elapsed.append(time.time() - start)
+
+        profile = cProfile.Profile()
+        profile.runcall(roundtrip, fdata, **kwargs)
+        stats = pstats.Stats(profile)
+        zlib_time, codec_time = profile_times(stats)
+        print('%-8s total %.3fs, zlib %.3fs, encode/decode %.3fs, '
+              'other %.3fs' % (name, min(elapsed), zlib_time, codec_time,
+                               stats.total_tt - zlib_time - codec_time))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,82 @@
+#! /usr/bin/env python
+
+# A part of pdfrw (https://github.com/pmaupin/pdfrw)
+# MIT license -- See LICENSE.txt for details
+
+'''
+Run from the directory above like so:
+
+   python -m tests.bench_writer [numobjs]
+
+Builds a PDF with numobjs indirect objects (100,000 by default),
+reads it back in, and then reports how fast PdfWriter writes it
+out (the best of 3 runs): with the default sorted dictionary keys,
+and with sort_keys=False.
+'''
+
+import gc
+import sys
+import time
+from io import BytesIO
+
+from pdfrw import PdfReader, PdfWriter, PdfDict, PdfArray, PdfName
+from pdfrw import IndirectPdfDict
+
+
+def make_pdf(numobjs):
+    # Each page is 4 objects:  the page, its contents,
+    # an annotation and the annotation's border style.
+    font = IndirectPdfDict(Type=PdfName.Font, Subtype=PdfName.Type1,
+                           BaseFont=PdfName.Helvetica)
+    writer = PdfWriter()
+    for i in range(numobjs // 4):
+        writer.addpage(PdfDict(
+            Type=PdfName.Page,
+            MediaBox=PdfArray([0, 0, 612, 792]),
+            Resources=PdfDict(Font=PdfDict(F1=font)),
+            Contents=PdfDict(stream='BT /F1 12 Tf 72 720 Td (%d) Tj ET' % i),
+            Annots=PdfArray([IndirectPdfDict(
+                Type=PdfName.Annot,
+                Subtype=PdfName.Square,
+                Rect=PdfArray([100, 100, 200 + i % 100, 200]),
+                C=PdfArray([1, 0, 0]),
+                BS=IndirectPdfDict(Type=PdfName.Border, W=2,
+                                   S=PdfName.D, D=PdfArray([3, 2])),
+            )]),
+        ))
+    f = BytesIO()
+    writer.write(f)
+    return f.getvalue()
+
+
+def timed_write(pages, **kwargs):
+    best = None
+    for i in range(3):
+        f = BytesIO()
+        writer = PdfWriter(f, **kwargs).addpages(pages)
+        gc.collect()
+        start = time.time()
+        writer.write()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, len(f.getvalue())
+
+
+def main(numobjs=100000):
+    fdata = make_pdf(numobjs)
+    reader = PdfReader(fdata=fdata)
+    reader.read_all()
+    numobjs = len(reader.indirect_objects)
+    print('%d objects, %d bytes' % (numobjs, len(fdata)))
+
+    pages = reader.pages
+    for label, kwargs in (('sorted', {}),
+                          ('unsorted', dict(sort_keys=False))):
+        elapsed, size = timed_write(pages, **kwargs)
+        print('%-9s %.2fs, %d objects/s, %.1fMB/s' %
+              (label, elapsed, numobjs / elapsed, size / elapsed / 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
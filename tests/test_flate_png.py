@@ -11,7 +11,9 @@ python -m tests.test_pdfstring
 '''
 
 
-from pdfrw.uncompress import flate_png, flate_png_impl
+from pdfrw import uncompress
+from pdfrw.uncompress import flate_png, flate_png_impl, png_rows
+from pdfrw.errors import PdfParseError
 from pdfrw.py23_diffs import zlib, xrange, from_array, convert_load, convert_store
 
 import unittest
@@ -20,6 +22,7 @@ import array
 import logging
 import ast
 import os
+import random
 
 #
 # Sample PNGs with filtered scanlines retrieved from
@@ -392,6 +395,63 @@ class TestFlatePNG(unittest.TestCase):
         self.util_test_flate_png_alt_from_png_log_file("./basn0g08.png.log")
 
 
+def create_random_rows(nrows, rowbytes, filter_types, seed=0):
+    rand = random.Random(seed)
+    data = array.array('B')
+    for r in xrange(nrows):
+        data.append(rand.choice(filter_types))
+        data.extend(rand.randrange(256) for c in xrange(rowbytes))
+    return from_array(data)
+
+class TestFlatePNGEngines(unittest.TestCase):
+    ''' Checks that the pure-Python and (if available) NumPy
+        predictor engines agree.  (tests/bench_flate_png.py
+        reports their throughput.)
+    '''
+
+    def check_engines(self, nrows, columns, colors, filter_types):
+        data = create_random_rows(nrows, columns * colors, filter_types)
+        saved = uncompress.numpy
+        results = []
+        try:
+            for numpy in set([None, saved]):
+                uncompress.numpy = numpy
+                result, error = flate_png_impl(data, 12, columns, colors, 8)
+                assert error is None
+                assert len(result) == nrows * columns * colors
+                results.append(result)
+        finally:
+            uncompress.numpy = saved
+        for result in results[1:]:
+            assert result == results[0]
+
+    def test_engines_xref(self):
+        # Xref streams are typically all Up rows of a few bytes
+        self.check_engines(500, 5, 1, [2])
+
+    def test_engines_image(self):
+        self.check_engines(30, 60, 3, [0, 1, 2, 3, 4])
+
+    def test_engines_image_sub_up(self):
+        self.check_engines(30, 60, 3, [1, 2])
+
+    def test_png_rows(self):
+        data = create_random_rows(500, 30, [0, 1, 2, 3, 4])
+        expected, error = flate_png_impl(data, 12, 10, 3, 8)
+        rows = (data[i:i + 31] for i in xrange(0, len(data), 31))
+        result = array.array('B')
+        for row in png_rows(rows, 30, 3):
+            assert len(row) == 30
+            result.extend(row)
+        assert result == expected
+
+    def test_png_rows_errors(self):
+        with self.assertRaises(PdfParseError):
+            list(png_rows([b'\x07ab'], 2, 1))
+        with self.assertRaises(PdfParseError):
+            list(png_rows([b'\x00abc'], 2, 1))
+
+
 def main():
     unittest.main()
 
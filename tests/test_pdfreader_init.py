@@ -1,7 +1,11 @@
 #! /usr/bin/env python
+import os
+import shutil
+import tempfile
 import static_pdfs
 
-from pdfrw import PdfReader
+from pdfrw import PdfReader, PdfDict
+from pdfrw.blockfile import BlockFile
 
 try:
     import unittest2 as unittest
@@ -20,6 +24,85 @@ class TestPdfReaderInit(unittest.TestCase):
             pdf_bytes = pdf_file.read()
             PdfReader(fdata=pdf_bytes)
 
+    def test_fname_mmap(self):
+        fname = static_pdfs.pdffiles[0][0]
+        mapped = PdfReader(fname, mmap=True)
+        loaded = PdfReader(fname)
+        self.assertEqual(len(mapped.pages), len(loaded.pages))
+        mapped.read_all()
+        loaded.read_all()
+        for key, obj in loaded.indirect_objects.items():
+            self.assertEqual(getattr(obj, 'stream', None),
+                             getattr(mapped.indirect_objects[key],
+                                     'stream', None))
+
+    def test_fdata_binary_streams(self):
+        with open(static_pdfs.pdffiles[0][0], 'rb') as pdf_file:
+            pdf_bytes = pdf_file.read()
+        reader = PdfReader(fdata=pdf_bytes, binary=True)
+        reader.read_all()
+        for obj in reader.indirect_objects.values():
+            stream = getattr(obj, 'stream', None)
+            self.assertTrue(stream is None or isinstance(stream, bytes))
+
+    def test_decompress_lazy(self):
+        fname = static_pdfs.pdffiles[0][0]
+        lazy = PdfReader(fname, decompress='lazy')
+        eager = PdfReader(fname, decompress=True)
+        for lpage, epage in zip(lazy.pages, eager.pages):
+            lcontents, econtents = lpage.Contents, epage.Contents
+            if isinstance(econtents, PdfDict):
+                self.assertEqual(lcontents.stream, econtents.stream)
+                self.assertEqual(lcontents.Filter, econtents.Filter)
+
+    def test_index_cache(self):
+        fname = static_pdfs.pdffiles[0][0]
+        cachedir = tempfile.mkdtemp()
+        try:
+            first = PdfReader(fname, index_cache=cachedir)
+            self.assertEqual(len(os.listdir(cachedir)), 1)
+            second = PdfReader(fname, index_cache=cachedir)
+            self.assertEqual(first.source.obj_offsets,
+                             second.source.obj_offsets)
+            self.assertEqual(len(first.pages), len(second.pages))
+        finally:
+            shutil.rmtree(cachedir)
+
+    def test_decompress_workers(self):
+        fname = static_pdfs.pdffiles[0][0]
+        serial = PdfReader(fname, decompress=True)
+        parallel = PdfReader(fname, decompress=True, workers=4)
+        for key, obj in serial.indirect_objects.items():
+            self.assertEqual(getattr(obj, 'stream', None),
+                             getattr(parallel.indirect_objects[key],
+                                     'stream', None))
+
+    def test_random_access(self):
+        fname = static_pdfs.pdffiles[0][0]
+        loaded = PdfReader(fname)
+        loaded.read_all()
+        saved = BlockFile.blocksize, BlockFile.margin
+        try:
+            # Tiny blocks, so that tokens straddle the windows
+            for blocksize in (BlockFile.blocksize, 37, 1):
+                BlockFile.blocksize = BlockFile.margin = blocksize
+                with open(fname, 'rb') as f:
+                    reader = PdfReader(f, random_access=True)
+                    reader.read_all()
+                    self.assertEqual(sorted(reader.indirect_objects),
+                                     sorted(loaded.indirect_objects))
+                    for key, obj in loaded.indirect_objects.items():
+                        self.assertEqual(
+                            getattr(obj, 'stream', None),
+                            getattr(reader.indirect_objects[key],
+                                    'stream', None))
+        finally:
+            BlockFile.blocksize, BlockFile.margin = saved
+
+    def test_first_page_unlinearized(self):
+        unlinearized = PdfReader(static_pdfs.pdffiles[0][0], first_page=True)
+        self.assertEqual(unlinearized.linearized, None)
+
 
 def main():
     unittest.main()
@@ -0,0 +1,367 @@
+#! /usr/bin/env python
+
+# A part of pdfrw (https://github.com/pmaupin/pdfrw)
+# MIT license -- See LICENSE.txt for details
+
+'''
+Tests for the PdfReader options, using PDFs built by the tests
+(so they do not need the static_pdfs package).
+'''
+
+import os
+import random
+import shutil
+import tempfile
+from io import BytesIO
+
+from pdfrw import (PdfReader, PdfWriter, PdfDict, PdfArray, PdfName,
+                   IndirectPdfDict)
+from pdfrw.objects import PdfIndirect
+from pdfrw.buildxobj import pagexobj
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+def make_pdf(numpages, compress=False):
+    writer = PdfWriter(compress=compress)
+    for i in range(numpages):
+        writer.addpage(PdfDict(
+            Type=PdfName.Page,
+            MediaBox=PdfArray([0, 0, 612, 792]),
+            Contents=PdfDict(stream='%d 0 m %d 100 l S' % (i, i)),
+        ))
+    f = BytesIO()
+    writer.write(f)
+    return f.getvalue()
+
+
+def make_linearized(numpages):
+    ''' Build a (minimal) linearized PDF by hand.  Returns the
+        file data, and the offset of the end of the first page.
+    '''
+    # Objects 1 .. numpages * 2 - 1 are the page tree and the
+    # other pages; the first page section follows them.
+    lin, catalog, page, contents = [numpages * 2 + i for i in range(4)]
+    size = contents + 1
+    stream = b'0 0 m 100 100 l S'
+    first = {
+        catalog: b'<</Type /Catalog /Pages 1 0 R>>',
+        page: (b'<</Type /Page /Parent 1 0 R /MediaBox [0 0 612 792] '
+               b'/Contents %d 0 R>>' % contents),
+        contents: (b'<</Length %d>>\nstream\n%s\nendstream' %
+                   (len(stream), stream)),
+    }
+    kids = [page] + [2 + i * 2 for i in range(numpages - 1)]
+    rest = {1: (b'<</Type /Pages /Count %d /Kids [%s]>>' %
+                (numpages, b' '.join(b'%d 0 R' % x for x in kids)))}
+    for i in range(numpages - 1):
+        num = 2 + i * 2
+        rest[num] = (b'<</Type /Page /Parent 1 0 R /MediaBox [0 0 612 792] '
+                     b'/Contents %d 0 R>>' % (num + 1))
+        rest[num + 1] = (b'<</Length %d>>\nstream\n%s\nendstream' %
+                         (len(stream), stream))
+
+    def build(length, endfirst, mainxref):
+        offsets = {}
+        out = [b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n']
+
+        def add(num, body):
+            offsets[num] = sum(len(x) for x in out)
+            out.append(b'%d 0 obj\n%s\nendobj\n' % (num, body))
+
+        add(lin, b'<</Linearized 1 /L %010d /H [0 0] /O %d /E %010d '
+                 b'/N %d /T %010d>>' % (length, page, endfirst,
+                                        numpages, mainxref))
+        firstxref = sum(len(x) for x in out)
+        table = b''.join(b'%010d 00000 n \n' % offsets.get(num, 0)
+                         for num in range(lin, size))
+        out.append(b'xref\n%d %d\n' % (lin, size - lin))
+        tableloc = len(out)
+        out.append(table)
+        out.append(b'trailer\n<</Size %d /Root %d 0 R /Prev %010d>>\n'
+                   b'startxref\n0\n%%%%EOF\n' % (size, catalog, mainxref))
+        for num in sorted(first):
+            add(num, first[num])
+        out[tableloc] = b''.join(b'%010d 00000 n \n' % offsets[num]
+                                 for num in range(lin, size))
+        endfirst = sum(len(x) for x in out)
+        for num in sorted(rest):
+            add(num, rest[num])
+        mainxref = sum(len(x) for x in out)
+        out.append(b'xref\n0 %d\n0000000000 65535 f \n' % lin)
+        out.append(b''.join(b'%010d 00000 n \n' % offsets[num]
+                            for num in range(1, lin)))
+        out.append(b'trailer\n<</Size %d>>\nstartxref\n%d\n%%%%EOF\n' %
+                   (lin, firstxref))
+        data = b''.join(out)
+        return data, endfirst, mainxref
+
+    data, endfirst, mainxref = build(0, 0, 0)
+    data, endfirst, mainxref = build(len(data), endfirst, mainxref)
+    return data, endfirst
+
+
+def make_page_tree(numpages, fanout, count_error=0):
+    ''' Build a PDF with a page tree fanout nodes wide, with
+        count_error added to the /Count of the root.
+    '''
+    nodes = [IndirectPdfDict(
+        Type=PdfName.Page,
+        MediaBox=PdfArray([0, 0, 612, 792]),
+        Contents=PdfDict(stream='%d' % i),
+    ) for i in range(numpages)]
+    counts = [1] * numpages
+    while len(nodes) > 1 or counts[0] == 1:
+        parents, parent_counts = [], []
+        for i in range(0, len(nodes), fanout):
+            kids = nodes[i:i + fanout]
+            parents.append(IndirectPdfDict(
+                Type=PdfName.Pages,
+                Count=sum(counts[i:i + fanout]),
+                Kids=PdfArray(kids)))
+            parent_counts.append(parents[-1].Count)
+            for kid in kids:
+                kid.Parent = parents[-1]
+        nodes, counts = parents, parent_counts
+    nodes[0].Count += count_error
+    trailer = PdfDict(Root=IndirectPdfDict(Type=PdfName.Catalog,
+                                           Pages=nodes[0]))
+    f = BytesIO()
+    PdfWriter().write(f, trailer)
+    return f.getvalue()
+
+
+class TestPdfReaderModes(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.fname = tempfile.mkstemp(suffix='.pdf')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(make_pdf(5))
+
+    def tearDown(self):
+        os.remove(self.fname)
+
+    def check(self, reader):
+        self.assertEqual([page.Contents.stream for page in reader.pages],
+                         ['%d 0 m %d 100 l S' % (i, i) for i in range(5)])
+
+    def check_close(self, **kwargs):
+        with PdfReader(self.fname, **kwargs) as reader:
+            self.check(reader)
+            opened = list(reader.opened)
+        self.assertEqual(len(opened), 1)
+        self.assertEqual(reader.opened, [])
+        return opened[0]
+
+    def check_position(self, **kwargs):
+        # A file object is not closed, and its position is used
+        prefix = b'Not part of the PDF\n'
+        with open(self.fname, 'rb') as f:
+            fdata = f.read()
+        with open(self.fname, 'wb') as f:
+            f.write(prefix + fdata)
+        with open(self.fname, 'rb') as f:
+            f.seek(len(prefix))
+            with PdfReader(f, **kwargs) as reader:
+                self.check(reader)
+                self.assertEqual(reader.source.fdata[:5], '%PDF-')
+                self.assertEqual(reader.opened, [])
+            self.assertFalse(f.closed)
+
+    def test_read_all_chain(self):
+        # Each object is only found by loading the one before it
+        first = item = IndirectPdfDict(Index=0)
+        for i in range(1, 2000):
+            item.Next = item = IndirectPdfDict(Index=i)
+        writer = PdfWriter()
+        writer.addpage(PdfDict(Type=PdfName.Page, Chain=first))
+        f = BytesIO()
+        writer.write(f)
+        reader = PdfReader(fdata=f.getvalue())
+        reader.read_all()
+        self.assertFalse(reader.deferred_objects)
+        self.assertFalse([x for x in reader.indirect_objects.values()
+                          if isinstance(x, PdfIndirect)])
+        item = reader.pages[0].Chain
+        for i in range(2000):
+            self.assertEqual(item.Index, str(i))
+            item = item.Next
+        self.assertIsNone(item)
+
+    def test_mmap_close(self):
+        data = self.check_close(mmap=True)
+        # (Python 2 mmap objects have no closed attribute)
+        self.assertRaises(ValueError, data.__getitem__, slice(0, 5))
+        self.check_position(mmap=True)
+
+    def test_random_access_close(self):
+        self.assertTrue(self.check_close(random_access=True).f.closed)
+        self.check_position(random_access=True)
+
+    def test_index_cache(self):
+        cachedir = tempfile.mkdtemp()
+        try:
+            first = PdfReader(self.fname, index_cache=cachedir)
+            self.assertEqual(len(os.listdir(cachedir)), 1)
+            for kwargs in ({}, dict(random_access=True)):
+                reader = PdfReader(self.fname, index_cache=cachedir, **kwargs)
+                self.assertEqual(len(os.listdir(cachedir)), 1)
+                self.assertEqual(reader.source.obj_offsets,
+                                 first.source.obj_offsets)
+                self.check(reader)
+            # A changed file gets its own index
+            with open(self.fname, 'wb') as f:
+                f.write(make_pdf(6))
+            reader = PdfReader(self.fname, index_cache=cachedir)
+            self.assertEqual(len(os.listdir(cachedir)), 2)
+            self.assertEqual(len(reader.pages), 6)
+        finally:
+            shutil.rmtree(cachedir)
+
+    def test_index_cache_mtime(self):
+        # An edit that the hashed samples miss changes the mtime
+        writer = PdfWriter()
+        writer.addpage(PdfDict(
+            Type=PdfName.Page,
+            Contents=PdfDict(stream='0 0 m 1 1 l S' + ' ' * 500000)))
+        writer.write(self.fname)
+        cachedir = tempfile.mkdtemp()
+        try:
+            PdfReader(self.fname, index_cache=cachedir)
+            with open(self.fname, 'rb') as f:
+                fdata = f.read()
+            middle = len(fdata) // 2
+            with open(self.fname, 'wb') as f:
+                f.write(fdata[:middle] + b'\n' + fdata[middle + 1:])
+            mtime = os.path.getmtime(self.fname) + 10
+            os.utime(self.fname, (mtime, mtime))
+            PdfReader(self.fname, index_cache=cachedir)
+            self.assertEqual(len(os.listdir(cachedir)), 2)
+            # Data with no file is hashed in full
+            PdfReader(fdata=fdata, index_cache=cachedir)
+            PdfReader(fdata=fdata, index_cache=cachedir)
+            self.assertEqual(len(os.listdir(cachedir)), 3)
+        finally:
+            shutil.rmtree(cachedir)
+
+    def test_lazy_copy(self):
+        fdata = make_pdf(5, compress=True)
+        reader = PdfReader(fdata=fdata, decompress='lazy')
+        # One copied before its stream is used, one after
+        xobjs = [pagexobj(reader.pages[2])]
+        self.assertEqual(reader.pages[3].Contents.stream, '3 0 m 3 100 l S')
+        xobjs.append(pagexobj(reader.pages[3]))
+        page = PdfDict(
+            Type=PdfName.Page,
+            MediaBox=PdfArray([0, 0, 612, 792]),
+            Resources=PdfDict(XObject=PdfDict(Fm1=xobjs[0], Fm2=xobjs[1])),
+            Contents=PdfDict(stream='/Fm1 Do /Fm2 Do'))
+        f = BytesIO()
+        PdfWriter(f).addpage(page).write()
+        result = PdfReader(fdata=f.getvalue(), decompress=True)
+        xobjects = result.pages[0].Resources.XObject
+        self.assertEqual(xobjects.Fm1.stream, '2 0 m 2 100 l S')
+        self.assertEqual(xobjects.Fm2.stream, '3 0 m 3 100 l S')
+
+    def test_decode_cache_lru(self):
+        reader = PdfReader(fdata=make_pdf(5, compress=True),
+                           decompress='lazy')
+        cache = reader.decode_cache
+        cache.maxsize = 2
+        contents = [page.Contents for page in reader.pages]
+        decoders = [vars(x)['_rawstream'] for x in contents]
+        for i in (0, 1, 0, 2):
+            self.assertEqual(contents[i].stream,
+                             '%d 0 m %d 100 l S' % (i, i))
+        # 1 was used least recently
+        self.assertEqual(list(cache.decoded), [decoders[0], decoders[2]])
+        self.assertEqual(contents[1].stream, '1 0 m 1 100 l S')
+        self.assertEqual(list(cache.decoded), [decoders[2], decoders[1]])
+
+    def test_xref_stream_fields(self):
+        reader = PdfReader(fdata=make_pdf(1))
+        rand = random.Random(0)
+        for widths in ([1, 2, 1], [1, 4, 2], [1, 3, 2], [0, 2, 0], [2, 5, 0]):
+            count = 50
+            expected = [[], [], []]
+            stream = bytearray()
+            for i in range(count):
+                for field, width in zip(expected, widths):
+                    value = rand.randrange(256 ** width)
+                    field.append(value)
+                    stream.extend((value >> (8 * j)) & 255
+                                  for j in reversed(range(width)))
+            for field, width, default in zip(expected, widths, (1, 0, 0)):
+                if not width:
+                    field[:] = [default] * count
+            fields = reader.xref_stream_fields(bytes(stream), widths, count)
+            self.assertEqual([list(x) for x in fields], expected)
+            self.assertEqual(reader.xref_stream_fields(
+                bytes(stream[:-1]), widths, count), None)
+
+    def test_random_access_reads_little(self):
+        writer = PdfWriter()
+        for i in range(20):
+            writer.addpage(PdfDict(
+                Type=PdfName.Page,
+                MediaBox=PdfArray([0, 0, 612, 792]),
+                Contents=PdfDict(stream=('%d ' % i) * 100000),
+            ))
+        f = BytesIO()
+        writer.write(f)
+        f.seek(0)
+        reader = PdfReader(f, random_access=True)
+        self.assertEqual(reader.pages[10].Contents.stream[:3], '10 ')
+        blockfile = reader.source.fdata.data
+        self.assertTrue(blockfile.bytes_read < blockfile.size // 5)
+
+    def test_lazy_pages(self):
+        fdata = make_page_tree(1000, 10)
+        eager = PdfReader(fdata=fdata)
+        lazy = PdfReader(fdata=fdata, lazy_pages=True)
+        self.assertEqual(len(lazy.pages), 1000)
+        self.assertEqual(lazy.pages[537].Contents.stream, '537')
+        loaded = [x for x in lazy.indirect_objects.values()
+                  if not isinstance(x, PdfIndirect)]
+        self.assertTrue(len(loaded) < 50)
+        self.assertEqual(lazy.pages[-1].Contents.stream, '999')
+        self.assertEqual([x.Contents.stream for x in lazy.pages[5:50:7]],
+                         [x.Contents.stream for x in eager.pages[5:50:7]])
+        self.assertEqual([x.Contents.stream for x in lazy.pages],
+                         [x.Contents.stream for x in eager.pages])
+        self.assertRaises(IndexError, lambda: lazy.pages[1000])
+
+    def test_lazy_pages_bad_count(self):
+        fdata = make_page_tree(30, 4, count_error=5)
+        lazy = PdfReader(fdata=fdata, lazy_pages=True)
+        self.assertEqual(len(lazy.pages), 35)
+        self.assertEqual(lazy.numPages, 35)
+        # The tree doesn't match /Count, so it gets walked
+        self.assertEqual(lazy.pages[3].Contents.stream, '3')
+        self.assertEqual(len(lazy.pages), 30)
+        self.assertEqual(lazy.numPages, 30)
+        self.assertEqual([x.Contents.stream for x in lazy.pages],
+                         [str(x) for x in range(30)])
+
+    def test_first_page(self):
+        fdata, endfirst = make_linearized(5)
+        complete = PdfReader(fdata=fdata, first_page=True)
+        self.assertEqual(len(complete.pages), 5)
+        self.assertEqual(int(complete.linearized.N), 5)
+
+        partial = PdfReader(fdata=fdata[:endfirst + 10], first_page=True)
+        self.assertEqual(len(partial.pages), 1)
+        self.assertEqual(int(partial.linearized.N), 5)
+        self.assertEqual(partial.pages[0].Contents.stream,
+                         complete.pages[0].Contents.stream)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
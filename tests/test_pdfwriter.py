@@ -0,0 +1,507 @@
+#! /usr/bin/env python
+
+# A part of pdfrw (https://github.com/pmaupin/pdfrw)
+# MIT license -- See LICENSE.txt for details
+
+import os
+import tempfile
+from io import BytesIO
+
+from pdfrw import (PdfReader, PdfWriter, PdfDict, IndirectPdfDict, PdfArray,
+                   PdfName, PdfString)
+from pdfrw.errors import PdfOutputError
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+def make_pages(numpages):
+    return [PdfDict(
+        Type=PdfName.Page,
+        MediaBox=PdfArray([0, 0, 612, 792]),
+        Contents=PdfDict(stream='%d 0 m %d 100 l S' % (i, i)),
+    ) for i in range(numpages)]
+
+
+class TestPdfWriter(unittest.TestCase):
+
+    def write(self, pages, **kwargs):
+        f = BytesIO()
+        PdfWriter(f, **kwargs).addpages(pages).write()
+        return f.getvalue()
+
+    def test_streaming(self):
+        pages = make_pages(5)
+        for compress in (False, True):
+            normal = PdfReader(fdata=self.write(pages, compress=compress))
+            streamed = PdfReader(fdata=self.write(pages, compress=compress,
+                                                  streaming=True))
+            self.assertEqual(len(streamed.pages), len(normal.pages))
+            streamed.read_all()
+            normal.read_all()
+            self.assertEqual(sorted(streamed.indirect_objects),
+                             sorted(normal.indirect_objects))
+            for key, obj in normal.indirect_objects.items():
+                self.assertEqual(
+                    getattr(streamed.indirect_objects[key], 'stream', None),
+                    getattr(obj, 'stream', None))
+
+    def test_streaming_unloaded(self):
+        # Streams not read in yet are not kept after they are written
+        fd, fname = tempfile.mkstemp(suffix='.pdf')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.write(make_pages(5)))
+            for kwargs in (dict(mmap=True), dict(random_access=True)):
+                for compress in (False, True):
+                    with PdfReader(fname, **kwargs) as reader:
+                        data = self.write(reader.pages, streaming=True,
+                                          compress=compress)
+                        reader.read_all()
+                        self.assertFalse([
+                            x for x in reader.indirect_objects.values()
+                            if 'stream' in vars(x)])
+                    written = PdfReader(fdata=data)
+                    written.uncompress()
+                    self.assertEqual(
+                        [page.Contents.stream for page in written.pages],
+                        [page.Contents.stream for page in make_pages(5)])
+        finally:
+            os.remove(fname)
+
+    def test_objstreams(self):
+        pages = make_pages(150)
+        normal = self.write(pages)
+        for streaming in (False, True):
+            packed = self.write(pages, objstreams=True, streaming=streaming)
+            self.assertTrue(packed.startswith(b'%PDF-1.5'))
+            self.assertTrue(b'\nxref\n' not in packed)
+            self.assertTrue(len(packed) < len(normal))
+            reader = PdfReader(fdata=packed)
+            self.assertEqual(len(reader.pages), len(pages))
+            for page, newpage in zip(pages, reader.pages):
+                self.assertEqual(newpage.Contents.stream,
+                                 page.Contents.stream)
+                self.assertEqual([int(x) for x in newpage.MediaBox],
+                                 page.MediaBox)
+
+    def test_workers(self):
+        # Compression modifies the pages, so use a fresh set each time
+        for kwargs in ({}, dict(streaming=True)):
+            serial = self.write(make_pages(20), compress=True, **kwargs)
+            parallel = self.write(make_pages(20), compress=True, workers=4,
+                                  **kwargs)
+            self.assertEqual(parallel, serial)
+
+    def test_linearize(self):
+        pages = make_pages(6)
+        font = IndirectPdfDict(Type=PdfName.Font, Subtype=PdfName.Type1,
+                               BaseFont=PdfName.Helvetica)
+        for page in pages[::2]:
+            page.Resources = PdfDict(Font=PdfDict(F1=font))
+        data = self.write(pages, linearize=True)
+        self.assertTrue(data.find(b'/Linearized 1') < 1024)
+
+        reader = PdfReader(fdata=data)
+        linearized = reader.linearized
+        self.assertEqual(int(linearized.L), len(data))
+        self.assertEqual(int(linearized.N), len(pages))
+        self.assertEqual(data[int(linearized.T)], b'\n'[0])
+        self.assertEqual([page.Contents.stream for page in reader.pages],
+                         [page.Contents.stream for page in pages])
+        self.assertEqual(reader.pages[4].Resources.Font.F1.BaseFont,
+                         PdfName.Helvetica)
+
+        # Everything needed for the first page comes before /E
+        end = int(linearized.E)
+        partial = PdfReader(fdata=data[:end], first_page=True)
+        self.assertEqual(len(partial.pages), 1)
+        self.assertEqual(partial.pages[0].Contents.stream,
+                         pages[0].Contents.stream)
+        self.assertEqual(partial.pages[0].Resources.Font.F1.BaseFont,
+                         PdfName.Helvetica)
+
+        self.assertRaises(PdfOutputError, self.write, pages,
+                          linearize=True, objstreams=True)
+
+    def test_pagetree_fanout(self):
+        pages = make_pages(1000)
+        reader = PdfReader(fdata=self.write(pages, pagetree_fanout=32))
+        self.assertEqual([page.Contents.stream for page in reader.pages],
+                         [page.Contents.stream for page in pages])
+
+        depths = set()
+        stack = [(reader.Root.Pages, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if node.Type == PdfName.Page:
+                depths.add(depth)
+                continue
+            self.assertTrue(len(node.Kids) <= 32)
+            self.assertEqual(int(node.Count), sum(
+                1 if kid.Type == PdfName.Page else int(kid.Count)
+                for kid in node.Kids))
+            for kid in node.Kids:
+                self.assertTrue(kid.Parent is node)
+                stack.append((kid, depth + 1))
+        self.assertEqual(depths, set([2]))
+
+        small = make_pages(32)
+        self.assertEqual(self.write(small, pagetree_fanout=32),
+                         self.write(small))
+
+        # A fanout of 1 could never make the tree any narrower
+        for fanout in (1, -1, 2.5, True):
+            self.assertRaises(ValueError, PdfWriter,
+                              pagetree_fanout=fanout)
+        PdfWriter(pagetree_fanout=0)
+
+    def test_dedup(self):
+        def make_source(numpages):
+            # A separate copy of the same font for each source
+            font = IndirectPdfDict(
+                Type=PdfName.Font, Subtype=PdfName.Type1,
+                BaseFont=PdfName.Helvetica,
+                FontDescriptor=IndirectPdfDict(
+                    Type=PdfName.FontDescriptor,
+                    FontFile=PdfDict(stream='font data' * 100)))
+            pages = make_pages(numpages)
+            for page in pages:
+                page.Resources = PdfDict(Font=PdfDict(F1=font))
+            return pages
+
+        pages = make_source(3) + make_source(3) + make_source(3)
+        normal = self.write(pages)
+        deduped = self.write(pages, dedup=True)
+        self.assertEqual(normal.count(b'font data'), 3 * 100)
+        self.assertEqual(deduped.count(b'font data'), 100)
+        # 9 pages, with 3 different contents, and 1 font
+        self.assertEqual(deduped.count(b' obj'), 2 + 9 + 3 + 3)
+
+        reader = PdfReader(fdata=deduped)
+        self.assertEqual([page.Contents.stream for page in reader.pages],
+                         [page.Contents.stream for page in pages])
+        fonts = set(id(page.Resources.Font.F1) for page in reader.pages)
+        self.assertEqual(len(fonts), 1)
+
+    def test_dedup_annots(self):
+        # Identical annotations on different pages are kept apart
+        pages = make_pages(2)
+        for page in pages:
+            page.Annots = PdfArray([IndirectPdfDict(
+                Type=PdfName.Annot, Subtype=PdfName.Link,
+                Rect=PdfArray([0, 0, 100, 100]),
+                Border=PdfArray([0, 0, 0]))])
+            page.Widget = IndirectPdfDict(
+                Subtype=PdfName.Widget, Rect=PdfArray([0, 0, 10, 10]))
+            page.Field = IndirectPdfDict(FT=PdfName.Btn,
+                                         T=PdfString.from_unicode('x'))
+        reader = PdfReader(fdata=self.write(pages, dedup=True))
+        first, second = reader.pages
+        self.assertFalse(first.Annots[0] is second.Annots[0])
+        self.assertFalse(first.Widget is second.Widget)
+        self.assertFalse(first.Field is second.Field)
+
+        # Nor are direct ones made into one shared object
+        for page in pages:
+            annot = page.Annots[0]
+            annot.indirect = False
+            annot.Contents = PdfString.from_unicode('Big enough to share')
+        reader = PdfReader(fdata=self.write(pages, dedup_direct=True))
+        first, second = reader.pages
+        self.assertFalse(first.Annots[0] is second.Annots[0])
+
+    def test_dedup_direct(self):
+        font = IndirectPdfDict(Type=PdfName.Font, Subtype=PdfName.Type1,
+                               BaseFont=PdfName.Helvetica)
+        pages = make_pages(20)
+        for page in pages[:3]:
+            page.CropBox = PdfArray([10, 10, 600, 780])
+        for page in pages:
+            # Identical, but separate, direct dictionaries
+            page.Resources = PdfDict(
+                Font=PdfDict(F1=font),
+                ProcSet=PdfArray([PdfName.PDF, PdfName.Text]))
+        normal = self.write(pages)
+        shared = self.write(pages, dedup_direct=True)
+        self.assertEqual(normal.count(b'/ProcSet'), 20)
+        self.assertEqual(shared.count(b'/ProcSet'), 1)
+        self.assertTrue(len(shared) < len(normal))
+
+        reader = PdfReader(fdata=shared)
+        resources = set(id(page.Resources) for page in reader.pages)
+        self.assertEqual(len(resources), 1)
+        self.assertEqual(reader.pages[7].Resources.Font.F1.BaseFont,
+                         PdfName.Helvetica)
+        self.assertEqual([page.Contents.stream for page in reader.pages],
+                         [page.Contents.stream for page in pages])
+
+        # Small things that are not used much are not worth sharing
+        self.assertEqual(shared.count(b'/CropBox [10 10 600 780]'), 3)
+
+    def test_compact(self):
+        fonts = [IndirectPdfDict(Type=PdfName.Font, Subtype=PdfName.Type1,
+                                 BaseFont=PdfName(name))
+                 for name in ('Helvetica', 'Courier', 'Symbol')]
+        image = PdfDict(Type=PdfName.XObject, Subtype=PdfName.Image,
+                        Width=1, Height=1, BitsPerComponent=8,
+                        ColorSpace=PdfName.DeviceGray, stream='x')
+        resources = IndirectPdfDict(
+            Font=PdfDict(F1=fonts[0], F2=fonts[1], F3=fonts[2]),
+            XObject=PdfDict(Im1=image))
+        pages = make_pages(4)
+        for i, page in enumerate(pages):
+            page.Resources = resources
+            page.Contents.stream = 'BT /F%d 12 Tf ET' % (i % 2 + 1)
+        pages[0].Thumb = PdfDict(stream='thumbnail')
+        normal = self.write(pages)
+        compacted = self.write(pages, compact=True)
+        self.assertTrue(b'thumbnail' in normal)
+        self.assertTrue(b'thumbnail' not in compacted)
+        self.assertTrue(b'/Symbol' in normal)
+        self.assertTrue(b'/Symbol' not in compacted)
+        self.assertTrue(b'/Im1' not in compacted)
+
+        reader = PdfReader(fdata=compacted)
+        self.assertEqual([page.Contents.stream for page in reader.pages],
+                         [page.Contents.stream for page in pages])
+        self.assertEqual(reader.pages[3].Resources.Font.F2.BaseFont,
+                         PdfName.Courier)
+        self.assertEqual(reader.pages[0].Thumb, None)
+        self.assertEqual(sorted(reader.pages[0].Resources.Font),
+                         [PdfName.F1, PdfName.F2])
+        # The source pages are unchanged
+        self.assertEqual(len(resources.Font), 3)
+        self.assertTrue(pages[0].Thumb is not None)
+
+        # A form XObject with no resources of its own might use
+        # the page's, so nothing is pruned.
+        pages[1].Contents.stream = '/Fm1 Do'
+        resources.XObject.Fm1 = PdfDict(Subtype=PdfName.Form,
+                                        BBox=PdfArray([0, 0, 1, 1]),
+                                        stream='/Im1 Do')
+        reader = PdfReader(fdata=self.write(pages, compact=True))
+        self.assertEqual(len(reader.pages[0].Resources.Font), 3)
+
+    def test_prune_resources(self):
+        def named(kind, *names):
+            return PdfDict((PdfName(name), IndirectPdfDict(Type=kind, Id=i))
+                           for i, name in enumerate(names))
+
+        # A form that uses the page's resources
+        form = PdfDict(Subtype=PdfName.Form, BBox=PdfArray([0, 0, 1, 1]),
+                       stream='/Im2 Do')
+        xobjects = named(PdfName.XObject, 'Im1', 'Im2', 'Im3')
+        xobjects.Fm1 = form
+        resources = IndirectPdfDict(
+            Font=named(PdfName.Font, 'F1', 'F2', 'F3'),
+            XObject=xobjects,
+            ExtGState=named(PdfName.ExtGState, 'GS1', 'GS2'),
+            ColorSpace=named(PdfName.ColorSpace, 'CS1', 'CS2', 'CS3'),
+            Pattern=named(PdfName.Pattern, 'P1'),
+            Shading=named(PdfName.Shading, 'Sh1', 'Sh2'),
+            Properties=named(PdfName.Properties, 'MC1'),
+            ProcSet=PdfArray([PdfName.PDF]))
+        parent = IndirectPdfDict(Type=PdfName.Pages, Resources=resources)
+        pages = make_pages(3)
+        for page in pages:
+            page.Parent = parent
+        pages[0].Contents.stream = (
+            'q /GS1 gs /CS2 cs 1 0 0 sc /Pattern CS /P1 SCN '
+            'BT /F2 12 Tf (/F3 /Im3 Do) Tj ET /Sh2 sh\n'
+            '/OC /MC1 BDC /Fm1 Do EMC\n'
+            'BI /W 1 /H 1 /CS /CS3 /BPC 8 ID \x00/Im1 Do EI Q')
+        pages[1].Contents.stream = '/Im1 Do'
+
+        pruned = PdfReader(fdata=self.write(pages, prune_resources=True))
+        self.assertEqual(
+            dict((key[1:], sorted(value.keys()))
+                 for key, value in pruned.pages[0].Resources.items()
+                 if isinstance(value, PdfDict)),
+            dict(Font=['/F2'], XObject=['/Fm1', '/Im2'], ExtGState=['/GS1'],
+                 ColorSpace=['/CS2', '/CS3'], Pattern=['/P1'],
+                 Shading=['/Sh2'], Properties=['/MC1']))
+        self.assertEqual(pruned.pages[0].Resources.ProcSet, [PdfName.PDF])
+        self.assertEqual(sorted(pruned.pages[1].Resources),
+                         [PdfName.ProcSet, PdfName.XObject])
+        self.assertEqual(sorted(pruned.pages[1].Resources.XObject),
+                         [PdfName.Im1])
+        self.assertEqual(pruned.pages[2].Resources,
+                         PdfDict(ProcSet=[PdfName.PDF]))
+        self.assertEqual([page.Contents.stream for page in pruned.pages],
+                         [page.Contents.stream for page in pages])
+
+        normal = PdfReader(fdata=self.write(pages))
+        self.assertEqual(len(normal.pages[2].Resources.Font), 3)
+
+    def test_sort_keys(self):
+        pages = make_pages(3)
+        pages[0].Zebra = 1
+        pages[0].Apple = 2
+        normal = self.write(pages)
+        unsorted = self.write(pages, sort_keys=False)
+        self.assertEqual(len(unsorted), len(normal))
+        self.assertTrue(normal.find(b'/Apple') < normal.find(b'/Zebra'))
+        # (The unsorted order depends on the Python version)
+        reader = PdfReader(fdata=unsorted)
+        self.assertEqual(reader.pages[0].Zebra, '1')
+        self.assertEqual([page.Contents.stream for page in reader.pages],
+                         [page.Contents.stream for page in pages])
+
+    def test_reformat_unchanged(self):
+        pages = make_pages(3)
+        for page in pages:
+            page.Group = IndirectPdfDict(S=PdfName.Transparency,
+                                         CS=PdfName.DeviceRGB)
+        reader = PdfReader(fdata=self.write(pages))
+        first = self.write(reader.pages)
+        groups = [page.Group for page in reader.pages]
+        self.assertTrue(all('_formatted' in vars(x) for x in groups))
+        self.assertTrue('_formatted' not in vars(reader.pages[0]))
+        self.assertEqual(self.write(reader.pages), first)
+
+        # Changes are noticed
+        groups[0].S = PdfName.Other
+        # (An edit that bypasses the hook must be reported)
+        dict.__setitem__(groups[1], PdfName.CS, PdfName.DeviceGray)
+        reader.mark_changed(groups[1])
+        changed = PdfReader(fdata=self.write(reader.pages))
+        self.assertEqual(changed.pages[0].Group.S, PdfName.Other)
+        self.assertEqual(changed.pages[1].Group.CS, PdfName.DeviceGray)
+        self.assertEqual(changed.pages[2].Group.CS, PdfName.DeviceRGB)
+
+    def test_reformat_mutators(self):
+        # Every way of changing a dictionary drops its earlier output
+        mutators = [
+            lambda d: d.__delitem__(PdfName.CS),
+            lambda d: d.pop(PdfName.CS),
+            lambda d: d.update({PdfName.CS: PdfName.DeviceGray}),
+            lambda d: d.setdefault(PdfName.BM, PdfName.Multiply),
+            lambda d: d.popitem(),
+            lambda d: d.clear(),
+        ]
+        pages = make_pages(len(mutators))
+        for page in pages:
+            page.Group = IndirectPdfDict(CS=PdfName.DeviceRGB)
+        reader = PdfReader(fdata=self.write(pages))
+        self.write(reader.pages)
+        groups = [page.Group for page in reader.pages]
+        self.assertTrue(all('_formatted' in vars(x) for x in groups))
+        for group, mutate in zip(groups, mutators):
+            mutate(group)
+        changed = PdfReader(fdata=self.write(reader.pages))
+        self.assertEqual([dict(page.Group) for page in changed.pages],
+                         [dict(group) for group in groups])
+        self.assertEqual(changed.pages[2].Group.CS, PdfName.DeviceGray)
+        self.assertEqual(changed.pages[3].Group.BM, PdfName.Multiply)
+
+    def test_reformat_nested(self):
+        # Dictionaries holding direct arrays or dictionaries can
+        # change without being told, so they are not reused.
+        pages = make_pages(2)
+        for page in pages:
+            page.Group = IndirectPdfDict(S=PdfName.Transparency,
+                                         Matte=PdfArray([0, 0, 0]),
+                                         Ext=PdfDict(B=1))
+        reader = PdfReader(fdata=self.write(pages))
+        self.write(reader.pages)
+        groups = [page.Group for page in reader.pages]
+        self.assertFalse([x for x in groups if '_formatted' in vars(x)])
+        groups[0].Matte.append(1)
+        groups[1].Ext.B = 2
+        changed = PdfReader(fdata=self.write(reader.pages))
+        self.assertEqual(changed.pages[0].Group.Matte, ['0', '0', '0', '1'])
+        self.assertEqual(changed.pages[1].Group.Ext.B, '2')
+
+    def test_write_incremental(self):
+        fd, fname = tempfile.mkstemp(suffix='.pdf')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.write(make_pages(5)))
+            size = os.path.getsize(fname)
+            reader = PdfReader(fname)
+            reader.Info = IndirectPdfDict(
+                Title=PdfString.from_unicode('Updated'))
+            reader.pages[2].Rotate = 90
+            self.assertEqual(list(reader.changed_objects),
+                             [reader.pages[2].indirect])
+            PdfWriter(trailer=reader).write_incremental(fname)
+
+            with open(fname, 'rb') as f:
+                data = f.read()
+            self.assertEqual(data[size:].count(b' obj'), 2)
+            updated = PdfReader(fname)
+            self.assertEqual(updated.Info.Title.to_unicode(), 'Updated')
+            self.assertEqual(len(updated.pages), 5)
+            self.assertEqual([page.Rotate for page in updated.pages],
+                             [None, None, '90', None, None])
+            self.assertEqual(updated.pages[2].Contents.stream,
+                             reader.pages[2].Contents.stream)
+        finally:
+            os.remove(fname)
+
+    def test_write_incremental_nested(self):
+        # Edits to direct objects inside an indirect object mark it
+        fd, fname = tempfile.mkstemp(suffix='.pdf')
+        try:
+            font = IndirectPdfDict(Type=PdfName.Font, Subtype=PdfName.Type1,
+                                   BaseFont=PdfName.Helvetica)
+            pages = make_pages(3)
+            for page in pages:
+                page.Resources = PdfDict(Font=PdfDict(F1=font))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.write(pages))
+            reader = PdfReader(fname)
+            reader.read_all()
+            self.assertEqual(reader.changed_objects, {})
+            fonts = reader.pages[0].Resources.Font
+            fonts.F2 = fonts.F1
+            reader.pages[1].MediaBox[2] = 500
+            self.assertEqual(sorted(reader.changed_objects),
+                             sorted(page.indirect
+                                    for page in reader.pages[:2]))
+            PdfWriter(trailer=reader).write_incremental(fname)
+
+            updated = PdfReader(fname)
+            self.assertEqual(updated.pages[0].Resources.Font.F2.BaseFont,
+                             PdfName.Helvetica)
+            self.assertEqual(updated.pages[1].MediaBox,
+                             ['0', '0', '500', '792'])
+            self.assertEqual(updated.pages[2].Resources.Font.F2, None)
+        finally:
+            os.remove(fname)
+
+    def test_write_incremental_mutators(self):
+        fd, fname = tempfile.mkstemp(suffix='.pdf')
+        try:
+            pages = make_pages(5)
+            for page in pages:
+                page.Rotate = 0
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.write(pages))
+            reader = PdfReader(fname)
+            del reader.pages[0][PdfName.Rotate]
+            reader.pages[1].pop(PdfName.Rotate)
+            reader.pages[2].update({PdfName.Rotate: 90})
+            reader.pages[3].setdefault(PdfName.UserUnit, 2)
+            self.assertEqual(sorted(reader.changed_objects),
+                             sorted(page.indirect
+                                    for page in reader.pages[:4]))
+            PdfWriter(trailer=reader).write_incremental(fname)
+
+            updated = PdfReader(fname)
+            self.assertEqual([page.Rotate for page in updated.pages],
+                             [None, None, '90', '0', '0'])
+            self.assertEqual(updated.pages[3].UserUnit, '2')
+        finally:
+            os.remove(fname)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
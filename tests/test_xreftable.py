@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+# A part of pdfrw (https://github.com/pmaupin/pdfrw)
+# MIT license -- See LICENSE.txt for details
+
+'''
+Run from the directory above like so:
+python -m tests.test_xreftable
+'''
+
+from pdfrw.xreftable import OffsetTable, CompressedTable, SPARSE_LIMIT
+
+import random
+import unittest
+
+
+class TestXrefTable(unittest.TestCase):
+
+    def check_like_dict(self, table, makevalue):
+        rand = random.Random(0)
+        expected = {}
+        for i in range(2000):
+            key = (rand.randrange(300), rand.choice((0, 0, 0, 1)))
+            op = rand.randrange(3)
+            if op == 0:
+                value = makevalue(rand)
+                self.assertEqual(table.setdefault(key, value),
+                                 expected.setdefault(key, value))
+            elif op == 1:
+                table[key] = expected[key] = makevalue(rand)
+            else:
+                self.assertEqual(table.pop(key, None),
+                                 expected.pop(key, None))
+            self.assertEqual(table.get(key), expected.get(key))
+        self.assertEqual(len(table), len(expected))
+        self.assertEqual(sorted(table.items()), sorted(expected.items()))
+        self.assertEqual(sorted(table), sorted(expected))
+        self.assertEqual(table, expected)
+
+    def test_offsets(self):
+        self.check_like_dict(OffsetTable(),
+                             lambda rand: rand.randrange(1, 2 ** 40))
+
+    def test_compressed(self):
+        self.check_like_dict(CompressedTable(),
+                             lambda rand: (rand.randrange(1, 1000),
+                                           rand.randrange(100)))
+
+    def test_sparse(self):
+        table = OffsetTable()
+        table[(10 ** 9, 0)] = 5
+        table[(3, 0)] = 7
+        self.assertTrue(len(table.columns[0]) <= SPARSE_LIMIT)
+        self.assertEqual(table, {(10 ** 9, 0): 5, (3, 0): 7})
+
+    def test_update(self):
+        table = OffsetTable({(1, 0): 10, (2, 5): 20}.items())
+        table.update(OffsetTable([((1, 0), 11), ((3, 0), 30)]))
+        self.assertEqual(table, {(1, 0): 11, (2, 5): 20, (3, 0): 30})
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()